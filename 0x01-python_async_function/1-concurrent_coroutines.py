@@ -3,26 +3,166 @@
 Define an async routine called wait_n
 takes in 2 int arguments (in this order): n and max_delay.
 spawn wait_random n times with the specified max_delay.
+iter_wait_n yields the same delays one by one as they complete.
 '''
 import asyncio
-from typing import List
+import heapq
+import random
+from typing import AsyncGenerator, List, Set
 wait_random = __import__('0-basic_async_syntax').wait_random
 
 
-async def wait_n(n: int, max_delay: int) -> List[float]:
+async def wait_n(n: int, max_delay: int, limit: int = None,
+                 engine: str = "tasks") -> List[float]:
     """spawn wait_random n times with the specified max_delay
 
     Args:
         n (int)
         max_delay (int)
+        limit (int, optional): most wait_random running at once;
+                each one finishing starts the next, so memory stays
+                proportional to limit instead of n. Defaults to None
+                (all n at once).
+        engine (str, optional): "tasks" runs one task per delay,
+                "heap" draws the same delays and waits them out on a
+                single timer heap, without any task, so it takes no
+                limit. Defaults to "tasks".
 
     Returns:
         List[float]: the list of all the delays,
                 order without using sort() because of concurrency.
+
+    Raises:
+        ValueError: for an unknown engine, a limit below 1, or a limit
+                with the heap engine.
     """
+    if engine == "heap":
+        if limit is not None:
+            raise ValueError("the heap engine takes no limit")
+        return await _wait_n_heap(n, max_delay)
+    if engine != "tasks":
+        raise ValueError("unknown engine {!r}".format(engine))
+    if limit is not None:
+        return await _wait_n_limited(n, max_delay, limit)
+
     tasks = []
     for _ in range(n):
         task = asyncio.create_task(wait_random(max_delay))
         tasks.append(task)
 
     return [await task for task in asyncio.as_completed(tasks)]
+
+
+async def iter_wait_n(n: int, max_delay: int,
+                      limit: int = None) -> AsyncGenerator[float, None]:
+    """spawn wait_random n times and yield each delay as it completes
+
+    Results are handed over at the consumer's pace: a new wait_random
+    is only started once the consumer asks for the next delay, so at
+    most limit of them are running or waiting to be consumed. The ones
+    left are cancelled when the generator is closed: a consumer that
+    stops early must await its aclose() (or iterate it inside
+    contextlib.aclosing on Python 3.10+), since after a plain break
+    they keep running until the generator is garbage collected.
+
+        delays = iter_wait_n(n, max_delay)
+        try:
+            async for delay in delays:
+                if delay > 1:
+                    break
+        finally:
+            await delays.aclose()
+
+    Args:
+        n (int)
+        max_delay (int)
+        limit (int, optional): most wait_random running at once; also
+                bounds the work done before the first delay is yielded.
+                Defaults to None (all n at once).
+
+    Yields:
+        float: the delays in completion order.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    limit = n if limit is None else min(limit, n)
+    done: asyncio.Queue = asyncio.Queue()
+    pending: Set[asyncio.Task] = set()
+
+    def start() -> None:
+        """start one more wait_random"""
+        task = asyncio.ensure_future(wait_random(max_delay))
+        task.add_done_callback(done.put_nowait)
+        pending.add(task)
+
+    started = 0
+    try:
+        for _ in range(limit):
+            start()
+        started = limit
+        while pending:
+            task = await done.get()
+            pending.discard(task)
+            yield task.result()
+            if started < n:
+                start()
+                started += 1
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _wait_n_limited(n: int, max_delay: int,
+                          limit: int) -> List[float]:
+    """run wait_n with at most limit workers, each awaiting one
+    wait_random after the other and recording it when it completes
+
+    Args:
+        n (int)
+        max_delay (int)
+        limit (int)
+
+    Returns:
+        List[float]: the delays in completion order.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    delays: List[float] = []
+    remaining = n
+
+    async def worker() -> None:
+        """await wait_random until none is left to start"""
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            delays.append(await wait_random(max_delay))
+
+    await asyncio.gather(*(worker() for _ in range(min(limit, n))))
+    return delays
+
+
+async def _wait_n_heap(n: int, max_delay: int) -> List[float]:
+    """draw the n delays of wait_random up front, then pop them off a
+    min-heap in ascending order, sleeping once until each is due
+
+    Args:
+        n (int)
+        max_delay (int)
+
+    Returns:
+        List[float]: the delays in completion order.
+    """
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    heap = [random.uniform(0, max_delay) for _ in range(n)]
+    heapq.heapify(heap)
+    delays: List[float] = []
+    while heap:
+        delay = heapq.heappop(heap)
+        wait = start + delay - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        delays.append(delay)
+    return delays
@@ -2,30 +2,41 @@
 '''Define a measure_time function with integers n and max_delay
 measures the total execution time for wait_n(n, max_delay),
 and returns total_time / n. function should return a float.
+The time is read from the event loop clock, so under the virtual_clock
+policy it is the simulated time of the sleeps.
 
 '''
 import asyncio
-import time
 wait_n = __import__('1-concurrent_coroutines').wait_n
 
 
-def measure_time(n: int, max_delay: int) -> float:
+def measure_time(n: int, max_delay: int, engine: str = "tasks") -> float:
     """measures the total execution time for wait_n(n, max_delay)
 
     Args:
         n (int): _description_
         max_delay (int): _description_
+        engine (str, optional): wait_n engine, "tasks" or "heap".
+                Defaults to "tasks".
 
     Returns:
         float: total_time / n
     """
 
-    start = time.time()
+    elapsed = asyncio.run(_timed_wait_n(n, max_delay, engine))
 
-    asyncio.run(wait_n(n, max_delay))
+    return elapsed/n
 
-    end = time.time()
 
-    elapsed = end - start
+async def _timed_wait_n(n: int, max_delay: int, engine: str) -> float:
+    """run wait_n(n, max_delay) and time it with the loop clock
 
-    return elapsed/n
+    Returns:
+        float: elapsed seconds.
+    """
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+
+    await wait_n(n, max_delay, engine=engine)
+
+    return loop.time() - start
@@ -3,22 +3,165 @@
 Define an async routine called wait_n
 takes in 2 int arguments (in this order): n and max_delay.
 spawn wait_random n times with the specified max_delay.
+task_wait_n_deadline does the same under an overall and a per-task
+timeout, returning the delays gathered in time.
 '''
 import asyncio
-from typing import List
+from collections import deque
+from typing import Deque, List, NamedTuple, Set, Tuple
 task_wait_random = __import__('3-tasks').task_wait_random
 
 
-async def task_wait_n(n: int, max_delay: int) -> List[float]:
+async def task_wait_n(n: int, max_delay: int,
+                      limit: int = None) -> List[float]:
     """spawn wait_random n times with the specified max_delay
 
     Args:
         n (int)
         max_delay (int)
+        limit (int, optional): most task_wait_random tasks alive at
+                once; each one finishing starts the next, so memory
+                stays proportional to limit instead of n. Defaults to
+                None (all n at once).
 
     Returns:
         List[float]: the list of all the delays,
                 order without using sort() because of concurrency.
     """
-    tasks = [task_wait_random(max_delay) for _ in range(n)]
-    return [await task for task in asyncio.as_completed(tasks)]
+    if limit is None:
+        tasks = [task_wait_random(max_delay) for _ in range(n)]
+        return [await task for task in asyncio.as_completed(tasks)]
+
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    delays: List[float] = []
+    remaining = n
+
+    async def worker() -> None:
+        """await task_wait_random until none is left to start"""
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            delays.append(await task_wait_random(max_delay))
+
+    await asyncio.gather(*(worker() for _ in range(min(limit, n))))
+    return delays
+
+
+class PartialDelays(NamedTuple):
+    """what task_wait_n_deadline got done before its deadlines
+
+    delays: the delays that completed, in completion order.
+    completed: how many completed, len(delays).
+    cancelled: how many were cancelled for running out of time; with
+            a limit, n - completed - cancelled were never started.
+    """
+    delays: List[float]
+    completed: int
+    cancelled: int
+
+
+async def task_wait_n_deadline(n: int, max_delay: int, timeout: float = None,
+                               task_timeout: float = None,
+                               limit: int = None) -> PartialDelays:
+    """spawn task_wait_random n times, giving up on the ones that run
+    late instead of waiting for the slowest
+
+    Once timeout has passed, every task still running is cancelled and
+    the delays gathered so far are returned; a task running for longer
+    than task_timeout is cancelled on its own. Cancelled tasks are
+    awaited before returning, and so are all of them if this coroutine
+    is itself cancelled, so none is left behind.
+
+    Args:
+        n (int)
+        max_delay (int)
+        timeout (float, optional): seconds for the whole batch.
+                Defaults to None (no limit).
+        task_timeout (float, optional): seconds for each task, counted
+                from its start. Defaults to None (no limit).
+        limit (int, optional): most tasks running at once, as in
+                task_wait_n. Defaults to None (all n at once).
+
+    Returns:
+        PartialDelays: the delays in completion order, with the counts
+                of completed and cancelled tasks.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    loop = asyncio.get_event_loop()
+    forever = float("inf")
+    deadline = forever if timeout is None else loop.time() + timeout
+    delays: List[float] = []
+    cancelled = 0
+    started = 0
+    unsettled: Set[asyncio.Task] = set()
+    finished: Deque[asyncio.Task] = deque()
+    running: Deque[Tuple[float, asyncio.Task]] = deque()
+    wakeup = loop.create_future()
+
+    def wake_up() -> None:
+        """resume the loop below"""
+        if not wakeup.done():
+            wakeup.set_result(None)
+
+    def on_done(task: asyncio.Task) -> None:
+        """queue a finished task and wake the loop below"""
+        finished.append(task)
+        wake_up()
+
+    def launch() -> None:
+        """start the next task with its own expiry"""
+        nonlocal started
+        task = task_wait_random(max_delay)
+        task.add_done_callback(on_done)
+        expires = (forever if task_timeout is None
+                   else loop.time() + task_timeout)
+        running.append((expires, task))
+        unsettled.add(task)
+        started += 1
+
+    def settle(task: asyncio.Task) -> None:
+        """count a finished task once"""
+        nonlocal cancelled
+        if task not in unsettled:
+            return
+        unsettled.remove(task)
+        if task.cancelled():
+            cancelled += 1
+        else:
+            delays.append(task.result())
+
+    try:
+        for _ in range(n if limit is None else min(limit, n)):
+            launch()
+        while unsettled:
+            while finished:
+                settle(finished.popleft())
+                if started < n and loop.time() < deadline:
+                    launch()
+            now = loop.time()
+            if not unsettled or now >= deadline:
+                break
+            while running and (running[0][1].done() or
+                               running[0][0] <= now):
+                running.popleft()[1].cancel()
+            wake = min(deadline, running[0][0] if running else forever)
+            wakeup = loop.create_future()
+            handle = None
+            if wake < forever:
+                handle = loop.call_at(wake, wake_up)
+            try:
+                await wakeup
+            finally:
+                if handle is not None:
+                    handle.cancel()
+    finally:
+        stragglers = [task for task in unsettled if not task.done()]
+        for task in stragglers:
+            task.cancel()
+        if stragglers:
+            await asyncio.gather(*stragglers, return_exceptions=True)
+    for task in list(unsettled):
+        settle(task)
+    return PartialDelays(delays, len(delays), cancelled)
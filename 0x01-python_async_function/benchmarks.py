@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''Compare the wait_n engines with measure_time for n from 10^3 to
+10^6: the delays are tiny so the time left is the cost of scheduling
+them, one task per delay against one timer heap. With --virtual the
+delays are slept on the virtual clock and only the real scheduler
+overhead is timed, so max_delay no longer matters.
+
+'''
+import argparse
+from typing import Dict, List, Sequence
+measure_time = __import__('2-measure_runtime').measure_time
+virtual_time = __import__('virtual_clock').virtual_time
+
+SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+ENGINES = ("tasks", "heap")
+
+
+def run(sizes: Sequence[int] = SIZES, max_delay: float = 0.01,
+        engines: Sequence[str] = ENGINES,
+        virtual: bool = False) -> List[Dict[str, float]]:
+    """time measure_time(n, max_delay) with every engine for each n
+
+    Args:
+        sizes (Sequence[int]): values of n
+        max_delay (float): upper bound of every delay
+        engines (Sequence[str]): wait_n engines to compare
+        virtual (bool): sleep on the virtual clock and report the real
+                time the loop ran
+
+    Returns:
+        List[Dict[str, float]]: one row per n, with the total seconds
+                of each engine.
+    """
+    rows = []
+    for n in sizes:
+        row = {"n": n}
+        for engine in engines:
+            if virtual:
+                with virtual_time() as clock:
+                    measure_time(n, max_delay, engine=engine)
+                row[engine] = clock.stats()["real"]
+            else:
+                row[engine] = measure_time(n, max_delay, engine=engine) * n
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    """print the comparison as a table"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--max-delay", type=float, default=0.01)
+    parser.add_argument("--engines", nargs="+", default=ENGINES,
+                        choices=ENGINES)
+    parser.add_argument("--virtual", action="store_true")
+    args = parser.parse_args()
+    print("{:>9}".format("n") + "".join(
+        "{:>12}".format(engine) for engine in args.engines) + "{:>9}".format(
+        "speedup" if len(args.engines) == 2 else ""))
+    for row in run(args.sizes, args.max_delay, args.engines,
+                   args.virtual):
+        line = "{:>9}".format(row["n"]) + "".join(
+            "{:>11.3f}s".format(row[engine]) for engine in args.engines)
+        if len(args.engines) == 2:
+            line += "{:>8.1f}x".format(
+                row[args.engines[0]] / row[args.engines[1]])
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
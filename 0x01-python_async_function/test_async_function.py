@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+'''Unittests for the bounded-concurrency mode of wait_n and task_wait_n,
+the heap engine of wait_n, the virtual clock, iter_wait_n and
+task_wait_n_deadline'''
+import asyncio
+import random
+from unittest import TestCase, main
+from unittest.mock import patch
+
+concurrent = __import__('1-concurrent_coroutines')
+measure_time = __import__('2-measure_runtime').measure_time
+tasks = __import__('4-tasks')
+virtual_clock = __import__('virtual_clock')
+
+
+class Gauge:
+    """a wait_random that records how many run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.started = 0
+
+    async def __call__(self, max_delay: float) -> float:
+        self.running += 1
+        self.started += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            delay = random.uniform(0, max_delay)
+            await asyncio.sleep(delay)
+            return delay
+        finally:
+            self.running -= 1
+
+    def task(self, max_delay: float) -> asyncio.Task:
+        """a task_wait_random of the gauge."""
+        return asyncio.ensure_future(self(max_delay))
+
+
+def left_behind() -> int:
+    """tasks still alive besides the current one."""
+    return len([task for task in asyncio.all_tasks()
+                if task is not asyncio.current_task()])
+
+
+class VirtualTestCase(TestCase):
+    """run every test on the virtual clock with a fixed seed."""
+
+    def setUp(self):
+        """install the virtual clock and seed random."""
+        random.seed(0)
+        self.clock = virtual_clock.virtual_time()
+        self.clock.__enter__()
+        self.addCleanup(self.clock.__exit__, None, None, None)
+
+    def run_timed(self, coroutine):
+        """run coroutine, returning its result and simulated time."""
+        async def timed():
+            loop = asyncio.get_event_loop()
+            start = loop.time()
+            result = await coroutine
+            return result, loop.time() - start
+        return asyncio.run(timed())
+
+
+class TestLimit(TestCase):
+    """test the limit= worker pool of wait_n and task_wait_n."""
+
+    def setUp(self):
+        """seed random so the delays are the same every run."""
+        random.seed(0)
+
+    def test_wait_n_limit(self):
+        """test that at most limit wait_random run at once."""
+        gauge = Gauge()
+        with patch.object(concurrent, "wait_random", gauge):
+            delays = asyncio.run(concurrent.wait_n(40, 0.01, limit=4))
+        self.assertEqual((len(delays), gauge.peak), (40, 4))
+
+    def test_task_wait_n_limit(self):
+        """test that task_wait_n keeps at most limit tasks alive."""
+        gauge = Gauge()
+        with patch.object(tasks, "task_wait_random", gauge.task):
+            delays = asyncio.run(tasks.task_wait_n(30, 0.01, limit=3))
+        self.assertEqual((len(delays), gauge.peak), (30, 3))
+
+    def test_limit_above_n(self):
+        """test that a limit above n runs all n at once."""
+        gauge = Gauge()
+        with patch.object(concurrent, "wait_random", gauge):
+            delays = asyncio.run(concurrent.wait_n(5, 0.01, limit=50))
+        self.assertEqual((len(delays), gauge.peak), (5, 5))
+
+    def test_invalid_limit(self):
+        """test that a limit below 1 raises ValueError."""
+        for function in (concurrent.wait_n, tasks.task_wait_n):
+            with self.assertRaises(ValueError):
+                asyncio.run(function(3, 1, limit=0))
+
+
+class TestHeapEngine(TestCase):
+    """test the heap engine of wait_n."""
+
+    def test_delays_in_ascending_order(self):
+        """test that the heap engine returns every drawn delay sorted."""
+        random.seed(0)
+        drawn = [random.uniform(0, 0.05) for _ in range(50)]
+        random.seed(0)
+        delays = asyncio.run(concurrent.wait_n(50, 0.05, engine="heap"))
+        self.assertEqual(delays, sorted(drawn))
+
+    def test_takes_no_task(self):
+        """test that the heap engine never calls wait_random."""
+        with patch.object(concurrent, "wait_random") as mock_wait:
+            delays = asyncio.run(concurrent.wait_n(10, 0.01, engine="heap"))
+        self.assertEqual(len(delays), 10)
+        mock_wait.assert_not_called()
+
+    def test_unknown_engine(self):
+        """test that an unknown engine raises ValueError."""
+        with self.assertRaises(ValueError):
+            asyncio.run(concurrent.wait_n(1, 1, engine="threads"))
+
+    def test_limit_is_rejected(self):
+        """test that a limit with the heap engine raises ValueError."""
+        with self.assertRaises(ValueError):
+            asyncio.run(concurrent.wait_n(5, 0, limit=1, engine="heap"))
+
+
+class TestVirtualClock(TestCase):
+    """test the virtual-clock event loop policy."""
+
+    def test_sleeps_take_no_time(self):
+        """test that sleeping advances only the simulated clock."""
+        async def nap():
+            await asyncio.gather(asyncio.sleep(3600), asyncio.sleep(60))
+            return asyncio.get_event_loop().time()
+
+        previous = asyncio.get_event_loop_policy()
+        with virtual_clock.virtual_time() as clock:
+            self.assertEqual(asyncio.run(nap()), 3600)
+            self.assertEqual(asyncio.run(nap()), 3600)
+        self.assertIs(asyncio.get_event_loop_policy(), previous)
+        stats = clock.stats()
+        self.assertEqual((stats["loops"], stats["simulated"]), (2, 7200))
+        self.assertLess(stats["real"], 1)
+
+    def test_threadsafe_wakeup(self):
+        """test that a loop with no timers still waits for I/O."""
+        async def from_thread():
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, sum, [1, 2])
+
+        with virtual_clock.virtual_time():
+            self.assertEqual(asyncio.run(from_thread()), 3)
+
+
+class TestVirtualWaitN(VirtualTestCase):
+    """test wait_n and measure_time on the virtual clock."""
+
+    def test_measure_time(self):
+        """test that measure_time reports the simulated time per delay."""
+        per_delay = measure_time(100, 10)
+        self.assertGreater(per_delay, 0.09)
+        self.assertLessEqual(per_delay, 0.1)
+        self.assertLess(self.clock.stats()["real"], 1)
+
+    def test_tasks_engine(self):
+        """test that every delay comes back in completion order."""
+        delays, elapsed = self.run_timed(concurrent.wait_n(50, 10))
+        self.assertEqual(len(delays), 50)
+        self.assertEqual(delays, sorted(delays))
+        self.assertAlmostEqual(elapsed, delays[-1])
+
+    def test_heap_engine_matches_tasks(self):
+        """test that the heap engine draws and orders the same delays."""
+        expected, _ = self.run_timed(concurrent.wait_n(50, 10))
+        random.seed(0)
+        delays, elapsed = self.run_timed(
+            concurrent.wait_n(50, 10, engine="heap"))
+        self.assertEqual(delays, expected)
+        self.assertAlmostEqual(elapsed, delays[-1])
+
+    def test_limit_simulated_time(self):
+        """test that a limit of 4 takes about a quarter of the sum."""
+        delays, elapsed = self.run_timed(concurrent.wait_n(40, 10, limit=4))
+        self.assertAlmostEqual(elapsed, sum(delays) / 4, delta=10)
+
+
+class TestIterWaitN(VirtualTestCase):
+    """test the streaming iter_wait_n."""
+
+    def test_yields_every_delay_in_order(self):
+        """test that every delay is yielded as it completes."""
+        async def collect():
+            return [delay async for delay in concurrent.iter_wait_n(30, 10)]
+
+        delays, elapsed = self.run_timed(collect())
+        self.assertEqual(len(delays), 30)
+        self.assertEqual(delays, sorted(delays))
+        self.assertAlmostEqual(elapsed, delays[-1])
+
+    def test_backpressure(self):
+        """test that new delays only start as the consumer reads."""
+        gauge = Gauge()
+
+        async def consume():
+            seen = 0
+            async for _ in concurrent.iter_wait_n(20, 1, limit=3):
+                seen += 1
+                await asyncio.sleep(100)
+                self.assertLessEqual(gauge.started, seen + 3)
+            return seen
+
+        with patch.object(concurrent, "wait_random", gauge):
+            self.assertEqual(self.run_timed(consume())[0], 20)
+        self.assertEqual(gauge.peak, 3)
+
+    def test_aclose_cancels_the_rest(self):
+        """test that stopping early leaves no task behind."""
+        async def first():
+            delays = concurrent.iter_wait_n(100, 10)
+            async for delay in delays:
+                break
+            await delays.aclose()
+            return delay, left_behind()
+
+        (delay, alive), elapsed = self.run_timed(first())
+        self.assertEqual(alive, 0)
+        self.assertAlmostEqual(elapsed, delay)
+
+    def test_invalid_limit(self):
+        """test that a limit below 1 raises ValueError."""
+        async def first():
+            return await concurrent.iter_wait_n(3, 1, limit=0).__anext__()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(first())
+
+
+class TestTaskWaitNDeadline(VirtualTestCase):
+    """test the deadline-aware task_wait_n."""
+
+    def run_deadline(self, *args, **kwargs):
+        """run task_wait_n_deadline, checking nothing is left behind."""
+        async def run():
+            result = await tasks.task_wait_n_deadline(*args, **kwargs)
+            return result, left_behind()
+
+        (result, alive), elapsed = self.run_timed(run())
+        self.assertEqual(alive, 0)
+        self.assertEqual(result.completed, len(result.delays))
+        return result, elapsed
+
+    def test_without_deadlines(self):
+        """test that every task completes without a timeout."""
+        result, _ = self.run_deadline(50, 10)
+        self.assertEqual((result.completed, result.cancelled), (50, 0))
+
+    def test_overall_timeout(self):
+        """test that the stragglers are cancelled at the deadline."""
+        result, elapsed = self.run_deadline(200, 10, timeout=5)
+        self.assertAlmostEqual(elapsed, 5)
+        self.assertEqual(result.completed + result.cancelled, 200)
+        self.assertTrue(0 < result.completed < 200)
+        self.assertTrue(all(delay <= 5 for delay in result.delays))
+
+    def test_task_timeout(self):
+        """test that each task is cancelled past its own timeout."""
+        result, elapsed = self.run_deadline(40, 10, task_timeout=3, limit=4)
+        self.assertEqual(result.completed + result.cancelled, 40)
+        self.assertTrue(0 < result.cancelled < 40)
+        self.assertTrue(all(delay <= 3 for delay in result.delays))
+        self.assertGreater(elapsed, 3)
+
+    def test_timeout_before_every_start(self):
+        """test that with a limit some tasks are never started."""
+        result, elapsed = self.run_deadline(100, 10, timeout=2,
+                                            task_timeout=1, limit=5)
+        self.assertAlmostEqual(elapsed, 2)
+        self.assertLess(result.completed + result.cancelled, 100)
+
+    def test_caller_cancellation(self):
+        """test that cancelling the batch cancels every task."""
+        async def run():
+            batch = asyncio.ensure_future(tasks.task_wait_n_deadline(50, 10))
+            await asyncio.sleep(1)
+            batch.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await batch
+            return left_behind()
+
+        self.assertEqual(self.run_timed(run())[0], 0)
+
+
+if __name__ == "__main__":
+    main()
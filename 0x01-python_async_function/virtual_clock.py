@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+'''Define a virtual-clock event loop policy: every loop it creates keeps
+its own simulated clock, and whenever the loop would block waiting for
+its next timer the clock jumps straight to it, so asyncio.sleep returns
+at once while loop.time() reads as if it had really slept.
+
+    with virtual_time() as clock:
+        measure_time(1000, 10)   # simulated seconds per delay
+    clock.stats()                # simulated time, real overhead
+
+'''
+import asyncio
+import selectors
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """selector that advances the clock instead of sleeping out a timeout
+    """
+
+    def __init__(self, advance: Callable[[float], None]) -> None:
+        """keep the callback that moves the clock forward
+
+        Args:
+            advance (Callable[[float], None]): called with the seconds
+                    the loop wanted to wait
+        """
+        super().__init__()
+        self._advance = advance
+
+    def select(self, timeout: Optional[float] = None) -> List[Tuple]:
+        """poll without blocking; when nothing is ready, advance the clock
+        by timeout rather than waiting for it
+
+        Args:
+            timeout (float, optional): seconds until the next timer,
+                    None when there is none and only I/O can wake the
+                    loop, which then really waits.
+
+        Returns:
+            List[Tuple]: the ready (key, events) pairs.
+        """
+        if timeout is None or timeout <= 0:
+            return super().select(timeout)
+        events = super().select(0)
+        if not events:
+            self._advance(timeout)
+        return events
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """event loop whose time() is simulated: it starts at 0 and only
+    moves when every task is waiting on a timer
+    """
+
+    def __init__(self) -> None:
+        """start the simulated clock at 0"""
+        self.simulated = 0.0
+        self.real = 0.0
+        super().__init__(_VirtualSelector(self._advance))
+
+    def time(self) -> float:
+        """the simulated time, in seconds
+
+        Returns:
+            float: seconds slept since the loop was created.
+        """
+        return self.simulated
+
+    def run_forever(self) -> None:
+        """run the loop, adding the real time it took to self.real"""
+        start = time.perf_counter()
+        try:
+            super().run_forever()
+        finally:
+            self.real += time.perf_counter() - start
+
+    def _advance(self, seconds: float) -> None:
+        """jump the simulated clock forward
+
+        Args:
+            seconds (float): how far
+        """
+        self.simulated += seconds
+
+
+class VirtualClockPolicy(asyncio.DefaultEventLoopPolicy):
+    """event loop policy creating VirtualClockEventLoop loops, so
+    asyncio.run uses one too, and keeping them for stats()
+    """
+
+    def __init__(self) -> None:
+        """start without any loop"""
+        super().__init__()
+        self.loops: List[VirtualClockEventLoop] = []
+
+    def new_event_loop(self) -> VirtualClockEventLoop:
+        """create and remember a virtual-clock loop
+
+        Returns:
+            VirtualClockEventLoop: the new loop.
+        """
+        loop = VirtualClockEventLoop()
+        self.loops.append(loop)
+        return loop
+
+    def stats(self) -> Dict[str, Any]:
+        """totals over every loop created so far
+
+        Returns:
+            Dict[str, Any]: the number of `loops`, the `simulated`
+                    seconds they slept and the `real` seconds they ran,
+                    which is all scheduler overhead.
+        """
+        return {"loops": len(self.loops),
+                "simulated": sum(loop.simulated for loop in self.loops),
+                "real": sum(loop.real for loop in self.loops)}
+
+    def __enter__(self) -> "VirtualClockPolicy":
+        """install the policy, keeping the previous one to restore
+
+        Returns:
+            VirtualClockPolicy: the policy itself.
+        """
+        self._previous = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """restore the previous policy"""
+        asyncio.set_event_loop_policy(self._previous)
+
+
+def virtual_time() -> VirtualClockPolicy:
+    """a fresh VirtualClockPolicy, to be used as a context manager
+
+    Returns:
+        VirtualClockPolicy: install it with a with statement.
+    """
+    return VirtualClockPolicy()
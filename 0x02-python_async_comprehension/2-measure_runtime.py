@@ -3,10 +3,11 @@
 Define a coroutine function called async_comprehension
      collect 10 randoms using an async comprehensing over async_generator
      then return the 10 random numbers.
+The runtime is read from the event loop clock, so under the
+virtual_clock policy it is the simulated time of the sleeps.
 '''
 import asyncio
 import random
-import time
 
 async_comprehension = __import__('1-async_comprehension').async_comprehension
 
@@ -19,9 +20,10 @@ async def measure_runtime() -> float:
         float: the total runtime.
     """
 
-    start = time.time()
+    loop = asyncio.get_event_loop()
+    start = loop.time()
 
     await asyncio.gather(async_comprehension(), async_comprehension(),
                          async_comprehension(), async_comprehension())
 
-    return time.time() - start
+    return loop.time() - start
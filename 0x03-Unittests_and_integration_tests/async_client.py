@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""An asyncio github org client
+"""
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from client import GithubOrgClient
+from ratelimit import RateLimitExceeded, current_scheduler, rate_limited
+from utils import async_memoize, get_json_page
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+__all__ = [
+    "AsyncGithubOrgClient",
+    "async_get_json",
+    "async_get_json_page",
+    "gather_public_repos",
+]
+
+
+async def async_get_json(url: str, session: "aiohttp.ClientSession" = None,
+                         executor: Executor = None) -> Dict:
+    """Get JSON from remote URL without blocking the event loop.
+    """
+    return (await async_get_json_page(url, session, executor))[0]
+
+
+async def async_get_json_page(url: str,
+                              session: "aiohttp.ClientSession" = None,
+                              executor: Executor = None
+                              ) -> Tuple[Any, Optional[str]]:
+    """Get one JSON page and the URL of the next one.
+    With an aiohttp `session` the request is made natively on the loop;
+    only the active rate-limit scheduler applies to it, the session
+    pool, response cache, resilience layer and tracer of get_json are
+    skipped. Otherwise `utils.get_json_page` runs in `executor` (the
+    loop's default one when None), inside a copy of the current context
+    so every active layer still applies, at the cost of one thread per
+    request in flight. Either way a rate-limited request is resent as
+    get_json does.
+    """
+    if session is not None:
+        scheduler = current_scheduler()
+        waited = 0.0
+        while True:
+            if scheduler is not None:
+                waited += await scheduler.acquire_async()
+            async with session.get(url) as response:
+                if scheduler is not None:
+                    limited = response.status in (403, 429) and rate_limited(
+                        response.status, response.headers,
+                        await response.text())
+                    pause = scheduler.update(response.headers,
+                                             response.status, limited)
+                    if limited:
+                        if waited + pause > scheduler.max_wait:
+                            raise RateLimitExceeded(
+                                "{} is rate limited for {:.0f}s more"
+                                .format(url, pause), retry_after=pause)
+                        continue
+                data = await response.json(content_type=None)
+                next_link = response.links.get("next")
+                return data, str(next_link["url"]) if next_link else None
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, context.run,
+                                      get_json_page, url)
+
+
+class AsyncGithubOrgClient:
+    """An asyncio Githib org client
+    """
+    ORG_URL = GithubOrgClient.ORG_URL
+
+    def __init__(self, org_name: str,
+                 session: "aiohttp.ClientSession" = None,
+                 semaphore: asyncio.Semaphore = None,
+                 executor: Executor = None) -> None:
+        """Init method of AsyncGithubOrgClient
+        `semaphore` bounds the requests in flight when it is shared by
+        several clients; `session` and `executor` are passed on to
+        `async_get_json`.
+        """
+        self._org_name = org_name
+        self._session = session
+        self._semaphore = semaphore
+        self._executor = executor
+
+    async def _get_json_page(self, url: str) -> Tuple[Any, Optional[str]]:
+        """Fetch a page while holding the shared semaphore, if any"""
+        if self._semaphore is None:
+            return await async_get_json_page(url, self._session,
+                                             self._executor)
+        async with self._semaphore:
+            return await async_get_json_page(url, self._session,
+                                             self._executor)
+
+    @async_memoize
+    async def org(self) -> Dict:
+        """Memoize org"""
+        org, _ = await self._get_json_page(
+            self.ORG_URL.format(org=self._org_name))
+        return org
+
+    async def _public_repos_url(self) -> str:
+        """Public repos URL"""
+        return (await self.org())["repos_url"]
+
+    @async_memoize
+    async def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload, following every page"""
+        repos = []
+        url = await self._public_repos_url()
+        while url:
+            page, url = await self._get_json_page(url)
+            repos.extend(page)
+        return repos
+
+    async def public_repos(self, license: str = None) -> List[str]:
+        """Public repos"""
+        json_payload = await self.repos_payload()
+        return [
+            repo["name"] for repo in json_payload
+            if license is None or self.has_license(repo, license)
+        ]
+
+    has_license = staticmethod(GithubOrgClient.has_license)
+
+
+async def gather_public_repos(orgs: Sequence[str], license: str = None,
+                              limit: int = 100
+                              ) -> Dict[str, Union[List[str], Exception]]:
+    """Fetch the public repos of every org concurrently.
+    At most `limit` requests are in flight at once; the result maps
+    each org, in input order, to its `public_repos(license)`, or to the
+    exception that org failed with, so one failing org does not abort
+    the others. With aiohttp installed every request shares one event
+    loop (see `async_get_json_page` for the layers it skips); without
+    it they run on a pool of `limit` threads.
+    Example
+    -------
+    >>> asyncio.run(gather_public_repos(["google", "nobody"], "mit"))
+    {'google': ['dagger', ...], 'nobody': KeyError('repos_url')}
+    """
+    semaphore = asyncio.Semaphore(limit)
+    orgs = list(dict.fromkeys(orgs))
+    session = executor = None
+    if aiohttp is not None:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limit))
+    else:
+        executor = ThreadPoolExecutor(max_workers=limit)
+    try:
+        clients = [AsyncGithubOrgClient(org, session, semaphore, executor)
+                   for org in orgs]
+        results = await asyncio.gather(
+            *(client.public_repos(license) for client in clients),
+            return_exceptions=True)
+    finally:
+        if session is not None:
+            await session.close()
+        else:
+            executor.shutdown(wait=False)
+    return dict(zip(orgs, results))
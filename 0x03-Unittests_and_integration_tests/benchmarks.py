@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Benchmarks for the github org client hot paths.
+Run it directly to run the suite across payload sizes, write the results
+as JSON and compare them with a stored baseline:
+    ./benchmarks.py --baseline benchmarks_baseline.json --save-baseline
+    ./benchmarks.py --output results.json --baseline benchmarks_baseline.json
+Timings only compare on the machine that made them, so the baseline is
+not committed: save one locally first, and refresh it after upgrades.
+"""
+import json
+import platform
+import sys
+import time
+import timeit
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+)
+
+from client import GithubOrgClient
+from fixtures import TEST_PAYLOAD
+from json_backends import available_backends, get_backend
+from stub_server import StubGithubServer
+from synthetic import SyntheticOrg
+from utils import (access_nested_map, compile_path, extract_path, get_json,
+                   memoize, timed_memoize)
+
+REPOS_PAYLOAD = TEST_PAYLOAD[0][1]
+
+SIZES = (100, 1000, 10000)
+
+_LOWER_IS_BETTER = ("ns/record", "ns/access", "ns/repo", "ms/request")
+
+
+def bench_access_nested_map(copies: int = 1000, repeat: int = 5,
+                            repos: Sequence[Dict] = None
+                            ) -> Dict[str, float]:
+    """Compare ways of reading ("license", "key") from every repo.
+    The fixture repos are replicated `copies` times unless `repos` are
+    given; returns the best nanoseconds per record of
+    `access_nested_map`, a `compile_path` accessor and a single
+    `extract_path` call.
+    """
+    repos = REPOS_PAYLOAD * copies if repos is None else repos
+    path = ("license", "key")
+    accessor = compile_path(path)
+
+    def current() -> None:
+        """access_nested_map with the KeyError has_license relies on"""
+        for repo in repos:
+            try:
+                access_nested_map(repo, path)
+            except KeyError:
+                pass
+
+    def compiled() -> None:
+        """compiled accessor, one call per record"""
+        for repo in repos:
+            try:
+                accessor(repo)
+            except KeyError:
+                pass
+
+    def batch() -> None:
+        """compiled accessor, one call for all records"""
+        extract_path(repos, accessor, None)
+
+    results = {}
+    for name, run in (("access_nested_map", current),
+                      ("compile_path", compiled),
+                      ("extract_path", batch)):
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+        results[name] = best / len(repos) * 1e9
+    return results
+
+
+def bench_json_backends(copies: int = 200,
+                        repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Decode throughput of every installed JSON backend in MB/s.
+    Measured on the fixture org payload and on a repos page made of the
+    fixture repos replicated `copies` times, encoded as bytes the way
+    they come off the wire.
+    """
+    shapes = {
+        "org": json.dumps(TEST_PAYLOAD[0][0]).encode(),
+        "repos": json.dumps(REPOS_PAYLOAD * copies).encode(),
+    }
+    results = {}
+    for name in available_backends():
+        loads = get_backend(name).loads
+        results[name] = {}
+        for shape, raw in shapes.items():
+            number = max(1, 1000000 // len(raw))
+            best = min(timeit.repeat(lambda: loads(raw), number=number,
+                                     repeat=repeat))
+            results[name][shape] = len(raw) * number / best / 1e6
+    return results
+
+
+def bench_has_license(repos: Sequence[Dict],
+                      repeat: int = 5) -> Dict[str, float]:
+    """Best nanoseconds per repo of `GithubOrgClient.has_license`.
+    """
+    has_license = GithubOrgClient.has_license
+
+    def run() -> None:
+        """check every repo"""
+        for repo in repos:
+            has_license(repo, "apache-2.0")
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return {"has_license": best / len(repos) * 1e9}
+
+
+def bench_public_repos(client: GithubOrgClient,
+                       repeat: int = 5) -> Dict[str, float]:
+    """Best nanoseconds per repo of public_repos on a fetched client.
+    `public_repos_license_cold` rebuilds the license index on every
+    call, as after a refresh of the payload; `public_repos_license`
+    reuses it.
+    """
+    count = len(client.repos_payload)
+
+    def cold() -> None:
+        """filter with a freshly built license index"""
+        client.__dict__.pop("_license_index_cache", None)
+        client.public_repos("apache-2.0")
+
+    results = {}
+    for name, run in (
+            ("public_repos", lambda: client.public_repos()),
+            ("public_repos_license", lambda: client.public_repos("mit")),
+            ("public_repos_license_cold", cold)):
+        best = min(timeit.repeat(run, number=1, repeat=repeat))
+        results[name] = best / count * 1e9
+    return results
+
+
+def bench_memoize(number: int = 100000, repeat: int = 5
+                  ) -> Dict[str, float]:
+    """Nanoseconds per access of a memoized property after the first.
+    `attribute` is a plain instance attribute for reference.
+    """
+    class Subject:
+        """one value behind each kind of memoization"""
+
+        def __init__(self) -> None:
+            self.attribute = 42
+
+        @memoize
+        def memoized(self) -> int:
+            return 42
+
+        @timed_memoize()
+        def timed(self) -> int:
+            return 42
+
+        @timed_memoize(ttl=60, stale_while_revalidate=True,
+                       single_flight=True)
+        def single_flight(self) -> int:
+            return 42
+
+    subject = Subject()
+    results = {}
+    for name in ("attribute", "memoized", "timed", "single_flight"):
+        getattr(subject, name)
+        best = min(timeit.repeat("subject." + name, number=number,
+                                 repeat=repeat, globals={"subject": subject}))
+        results["memoize_" + name] = best / number * 1e9
+    return results
+
+
+def bench_get_json(server: StubGithubServer, org: SyntheticOrg,
+                   repeat: int = 5) -> Dict[str, float]:
+    """get_json of the whole repos listing of org in one page.
+    Returns the best milliseconds per request and MB/s over the
+    local socket, decoding included.
+    """
+    url = "{}/orgs/{}/repos?per_page={}".format(server.url, org.login,
+                                                len(org))
+    size = len(json.dumps(org[:]).encode())
+    best = min(timeit.repeat(lambda: get_json(url), number=1,
+                             repeat=repeat))
+    return {"get_json": best * 1e3, "get_json_throughput": size / best / 1e6}
+
+
+def run_suite(sizes: Iterable[int] = SIZES,
+              repeat: int = 5) -> Dict[str, Any]:
+    """Run every benchmark for every payload size.
+    Returns {"meta": ..., "results": {name: {"value", "unit"}}} where
+    names end with the payload size in repos, e.g. "has_license[1000]".
+    """
+    results = {}
+
+    def record(values: Dict[str, float], unit: str, size: int = None
+               ) -> None:
+        """store values under their sized names"""
+        for name, value in values.items():
+            if size is not None:
+                name = "{}[{}]".format(name, size)
+            results[name] = {"value": value, "unit": "MB/s" if "_throughput"
+                             in name else unit}
+
+    record(bench_memoize(repeat=repeat), "ns/access")
+    with StubGithubServer(page_size=100) as server:
+        for size in sizes:
+            org = SyntheticOrg("bench{}".format(size), size)
+            server.add_org(org.login, org, org.org_payload)
+            client = server.client(org.login)
+            repos = client.repos_payload
+            record(bench_access_nested_map(repeat=repeat, repos=repos),
+                   "ns/record", size)
+            record(bench_has_license(repos, repeat), "ns/record", size)
+            record(bench_public_repos(client, repeat), "ns/repo", size)
+            record(bench_get_json(server, org, repeat), "ms/request", size)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = 0.3) -> List[Dict[str, Any]]:
+    """Benchmarks of current that are worse than baseline.
+    A result regresses when it is more than `tolerance` (a fraction)
+    slower, or lower in throughput, than in the baseline. Benchmarks
+    missing from either side are ignored.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["unit"] != result["unit"] or \
+                not base["value"]:
+            continue
+        change = result["value"] / base["value"] - 1
+        if result["unit"] not in _LOWER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append({"name": name, "unit": result["unit"],
+                                "baseline": base["value"],
+                                "current": result["value"],
+                                "change": change})
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare with this results file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="overwrite --baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--json-backends", action="store_true",
+                        help="also print the JSON decoder throughputs")
+    args = parser.parse_args()
+
+    suite = run_suite(args.sizes, args.repeat)
+    for name, result in suite["results"].items():
+        print("{:<36} {:12.1f} {}".format(name, result["value"],
+                                          result["unit"]))
+    if args.json_backends:
+        for name, shapes in bench_json_backends().items():
+            for shape, rate in shapes.items():
+                print("{:<12} {:<8} {:8.1f} MB/s".format(name, shape, rate))
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(suite, stream, indent=2)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as stream:
+            json.dump(suite, stream, indent=2)
+    elif args.baseline:
+        with open(args.baseline) as stream:
+            regressions = compare(suite, json.load(stream), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION {name}: {baseline:.1f} -> {current:.1f} "
+                  "{unit} ({change:+.0%})".format(**regression))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Conditional-request response cache for get_json.
+"""
+import contextvars
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+import requests
+
+from json_backends import current_backend, decode_response
+from tracing import current_trace, phase
+
+__all__ = [
+    "ResponseCache",
+    "current_cache",
+]
+
+_current_cache = contextvars.ContextVar("current_cache", default=None)
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    next_url TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def current_cache() -> Optional["ResponseCache"]:
+    """Return the cache active in the current context, if any.
+    """
+    return _current_cache.get()
+
+
+class ResponseCache:
+    """A persistent, size-bounded cache of JSON responses keyed by URL.
+    Responses carrying an `ETag` or `Last-Modified` validator are stored
+    on disk. Later requests for the same URL send `If-None-Match` /
+    `If-Modified-Since` and a 304 answer is served from the cache. The
+    most recently decoded documents are also kept in memory so a 304
+    costs no JSON parsing; callers must not mutate what they get back.
+    Example
+    -------
+    >>> with ResponseCache("github.sqlite") as cache:
+    ...     get_json("https://api.github.com/orgs/google")
+    ...     get_json("https://api.github.com/orgs/google")
+    ...     cache.stats()["hits"]
+    1
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 memory_entries: int = 64) -> None:
+        """Init method of ResponseCache
+        Parameters
+        ----------
+        path: str
+            sqlite database file, ":memory:" keeps nothing on disk
+        max_entries: int
+            maximum number of stored responses
+        max_bytes: int
+            maximum total size of the stored bodies
+        memory_entries: int
+            number of decoded documents kept in memory
+        """
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._memory_entries = memory_entries
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "revalidations": 0,
+                          "stores": 0, "evictions": 0}
+        self._token = None
+
+    def __enter__(self) -> "ResponseCache":
+        """Make the cache the active one"""
+        self._token = _current_cache.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Deactivate and close the cache"""
+        if self._token is not None:
+            _current_cache.reset(self._token)
+            self._token = None
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def fetch(self, url: str,
+              send: Callable[..., requests.Response]) -> Any:
+        """Return the JSON document at `url`, revalidating a stored copy.
+        `send(url, headers)` performs the actual GET request.
+        """
+        return self.fetch_page(url, send)[0]
+
+    def fetch_page(self, url: str, send: Callable[..., requests.Response]
+                   ) -> Tuple[Any, Optional[str]]:
+        """Like `fetch`, also returning the `Link: rel="next"` URL.
+        """
+        entry = self._lookup(url)
+        headers = {}
+        if entry is not None:
+            etag, last_modified, next_url = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            self._count("revalidations")
+        response = send(url, headers)
+        trace = current_trace()
+        if entry is not None and response.status_code == 304:
+            with phase("decode"):
+                data = self._load(url)
+            if data is not _MISSING:
+                self._count("hits")
+                if trace is not None:
+                    trace.cache = "hit"
+                return data, next_url
+            # evicted since the lookup: ask again without validators
+            response = send(url, {})
+        self._count("misses")
+        if trace is not None:
+            trace.cache = "miss"
+        with phase("decode"):
+            data = decode_response(response)
+        next_url = response.links.get("next", {}).get("url")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            self._store(url, (etag, last_modified, next_url),
+                        response.content, data)
+        return data, next_url
+
+    def invalidate(self, url: str = None) -> None:
+        """Drop the entry for `url`, or every entry when `url` is None.
+        """
+        with self._lock:
+            if url is None:
+                self._db.execute("DELETE FROM responses")
+                self._decoded.clear()
+            else:
+                self._db.execute("DELETE FROM responses WHERE url = ?",
+                                 (url,))
+                self._decoded.pop(url, None)
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, revalidation, store and eviction counters along
+        with the current number of `entries` and their total `bytes`.
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            stats = dict(self._counters)
+        stats["entries"] = entries
+        stats["bytes"] = size
+        return stats
+
+    def _lookup(self, url: str) -> Optional[tuple]:
+        """Return the (etag, last_modified, next_url) stored for url"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT etag, last_modified, next_url FROM responses "
+                "WHERE url = ?", (url,)).fetchone()
+
+    def _load(self, url: str) -> Any:
+        """Return the stored document for url, decoding it if needed,
+        or _MISSING when the entry is gone"""
+        with self._lock:
+            if url in self._decoded:
+                self._decoded.move_to_end(url)
+                data = self._decoded[url]
+            else:
+                row = self._db.execute(
+                    "SELECT body FROM responses WHERE url = ?",
+                    (url,)).fetchone()
+                if row is None:
+                    return _MISSING
+                data = current_backend().loads(row[0])
+                self._remember(url, data)
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE url = ?",
+                (time.time(), url))
+            self._db.commit()
+        return data
+
+    def _store(self, url: str, meta: tuple, body: bytes,
+               data: Any) -> None:
+        """Store a fresh response and evict the least recently used"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url,) + meta + (body, len(body), time.time()))
+            self._remember(url, data)
+            self._counters["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the bounds hold"""
+        while True:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if entries <= self._max_entries and size <= self._max_bytes:
+                return
+            url, = self._db.execute(
+                "SELECT url FROM responses ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._decoded.pop(url, None)
+            self._counters["evictions"] += 1
+
+    def _remember(self, url: str, data: Any) -> None:
+        """Keep a decoded document in the in-memory LRU"""
+        self._decoded[url] = data
+        self._decoded.move_to_end(url)
+        while len(self._decoded) > self._memory_entries:
+            self._decoded.popitem(last=False)
+
+    def _count(self, counter: str) -> None:
+        """Increment one of the counters"""
+        with self._lock:
+            self._counters[counter] += 1
@@ -1,58 +1,261 @@
 #!/usr/bin/env python3
 """A github org client
 """
+import sys
 from typing import (
+    Any,
     List,
     Dict,
+    Iterator,
+    Optional,
 )
 
+from pool import (
+    SessionPool,
+    use_pool,
+)
+from store import SnapshotStore
+from sync import RepoSnapshot
+from tracing import (
+    operation,
+    operation_iter,
+)
 from utils import (
     get_json,
-    access_nested_map,
-    memoize,
+    iter_json_items,
+    iter_json_pages,
+    compile_path,
+    deep_sizeof,
+    extract_path,
+    invalidate,
+    memo_version,
+    timed_memoize,
 )
 
+_LICENSE_KEY = compile_path(("license", "key"))
+
+# raw repos kept by repo_records to estimate their size in
+# projection_report, instead of measuring every one of them
+_PROJECTION_SAMPLE = 32
+
+
+class RepoRecord:
+    """The fields of a repo that GithubOrgClient actually reads.
+    """
+    __slots__ = ("name", "license_key")
+
+    def __init__(self, name: str, license_key: Optional[str]) -> None:
+        """Init method of RepoRecord"""
+        self.name = name
+        self.license_key = license_key
+
+    def __repr__(self) -> str:
+        """Repr of RepoRecord"""
+        return "RepoRecord({!r}, {!r})".format(self.name, self.license_key)
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
 
-    def __init__(self, org_name: str) -> None:
-        """Init method of GithubOrgClient"""
+    def __init__(self, org_name: str, pool: SessionPool = None,
+                 ttl: float = None, projection: bool = False,
+                 stream: bool = False, snapshot: RepoSnapshot = None,
+                 store: SnapshotStore = None) -> None:
+        """Init method of GithubOrgClient
+        `pool` is the session pool used for this client's requests;
+        without one, the pool active at call time is used. With a `ttl`
+        (seconds), org and repos_payload are refreshed in the background
+        once they are older than that; the stale value is served until
+        the refresh completes. Both are fetched once even when several
+        threads ask for them at the same time.
+        With `projection`, public_repos and the license index are served
+        from compact `repo_records` and the raw repo dicts are released
+        page by page instead of being kept in repos_payload. With
+        `stream`, repos are decoded one by one from the response body
+        instead of a whole page at a time.
+        With a `snapshot`, repos are synced incrementally into it: a
+        refresh of repos_payload (on `ttl` expiry or through `sync`)
+        only fetches the repos updated since the previous one. Syncs
+        read whole pages, so `stream` does not apply to them.
+        With a `store`, the org payload and public_repos are answered
+        from it without network access until the repos are fetched;
+        fetching (e.g. `sync`) starts from the stored snapshot and saves
+        what changed back into the store.
+        """
         self._org_name = org_name
+        self._pool = pool
+        self._ttl = ttl
+        self._projection = projection
+        self._stream = stream
+        self._snapshot = snapshot
+        self._store = store
+        self._projection_sample = None
 
-    @memoize
+    @timed_memoize(ttl="_ttl", stale_while_revalidate=True,
+                   single_flight=True)
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        if self._store is not None and memo_version(self, "org") is None:
+            payload = self._store.org_payload(self._org_name)
+            if payload is not None:
+                return payload
+        with use_pool(self._pool), operation("org"):
+            payload = get_json(self.ORG_URL.format(org=self._org_name))
+        if self._store is not None:
+            self._store.save(self._org_name, org_payload=payload)
+        return payload
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
-    @memoize
-    def repos_payload(self) -> Dict:
-        """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+    @timed_memoize(ttl="_ttl", stale_while_revalidate=True,
+                   single_flight=True)
+    def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload, following every page"""
+        return list(operation_iter("repos_payload", self._iter_repos()))
+
+    def _iter_repos(self) -> Iterator[Dict]:
+        """Raw repo dicts across every page, streamed in stream mode"""
+        if self._snapshot is None and self._store is not None:
+            self._snapshot = self._store.snapshot(self._org_name)
+        if self._snapshot is not None:
+            repos = self._snapshot.sync(self._public_repos_url,
+                                        pool=self._pool)
+            if self._store is not None:
+                self._store.save(self._org_name, self._snapshot)
+            return iter(repos)
+        if self._stream:
+            return iter_json_items(self._public_repos_url, pool=self._pool)
+        pages = iter_json_pages(self._public_repos_url, pool=self._pool)
+        return (repo for page in pages for repo in page)
+
+    @timed_memoize(ttl="_ttl", stale_while_revalidate=True,
+                   single_flight=True)
+    def repo_records(self) -> List[RepoRecord]:
+        """Memoize the projected repos, releasing each raw dict"""
+        records = []
+        sample = []
+        for repo in operation_iter("repo_records", self._iter_repos()):
+            if len(sample) < _PROJECTION_SAMPLE:
+                sample.append(repo)
+            try:
+                key = _LICENSE_KEY(repo)
+            except KeyError:
+                key = None
+            if type(key) is str:
+                key = sys.intern(key)
+            records.append(RepoRecord(repo["name"], key))
+        self._projection_sample = sample
+        return records
+
+    def sync(self, full: bool = False) -> Optional[Dict[str, Any]]:
+        """Refresh the repos now and return the snapshot stats.
+        With `full`, or without a snapshot (returning None), the whole
+        listing is refetched.
+        """
+        if self._snapshot is not None and full:
+            self._snapshot.request_full_sync()
+        source = "repo_records" if self._projection else "repos_payload"
+        invalidate(self, source)
+        getattr(self, source)
+        if self._snapshot is None:
+            return None
+        return self._snapshot.stats()
+
+    def projection_report(self) -> Optional[Dict[str, int]]:
+        """Memory of the raw repo dicts against the projected records.
+        None until repo_records has been fetched. The raw size is
+        estimated from the first repos of the last fetch (`sampled`).
+        """
+        sample = self._projection_sample
+        if sample is None:
+            return None
+        records = self.repo_records
+        full_bytes = 0
+        if sample:
+            full_bytes = (sum(deep_sizeof(repo) for repo in sample) *
+                          len(records) // len(sample))
+        projected_bytes = deep_sizeof(records)
+        return {
+            "repos": len(records),
+            "sampled": len(sample),
+            "full_bytes": full_bytes,
+            "projected_bytes": projected_bytes,
+            "saved_bytes": full_bytes - projected_bytes,
+        }
+
+    def _repo_columns(self) -> tuple:
+        """(names, license keys) of the current repos"""
+        if self._projection:
+            records = self.repo_records
+            return ([record.name for record in records],
+                    [record.license_key for record in records])
+        payload = self.repos_payload
+        return ([repo["name"] for repo in payload],
+                extract_path(payload, _LICENSE_KEY, default=None))
+
+    @property
+    def _license_index(self) -> Dict[Optional[str], List[str]]:
+        """License key -> repo names, in payload order.
+        Built in a single pass over the repos and rebuilt whenever they
+        are refreshed; repos without a license key are indexed under None.
+        """
+        source = "repo_records" if self._projection else "repos_payload"
+        getattr(self, source)
+        version = memo_version(self, source)
+        cached = self.__dict__.get("_license_index_cache")
+        if cached is None or cached[0] != version:
+            index = {}
+            for name, key in zip(*self._repo_columns()):
+                index.setdefault(key, []).append(name)
+            cached = (version, index)
+            self.__dict__["_license_index_cache"] = cached
+        return cached[1]
 
     def public_repos(self, license: str = None) -> List[str]:
         """Public repos"""
-        json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        source = "repo_records" if self._projection else "repos_payload"
+        if self._store is not None and memo_version(self, source) is None:
+            names = self._store.public_repos(self._org_name, license)
+            if names is not None:
+                return names
+        if license is None:
+            if self._projection:
+                return [record.name for record in self.repo_records]
+            return [repo["name"] for repo in self.repos_payload]
+        return list(self._license_index.get(license, []))
+
+    def license_histogram(self) -> Dict[Optional[str], int]:
+        """Number of public repos per license key (None: no license)"""
+        return {key: len(names)
+                for key, names in self._license_index.items()}
 
-        return public_repos
+    def iter_public_repos(self, license: str = None) -> Iterator[str]:
+        """Lazily yield public repo names, one page in memory at a time.
+        The next page is prefetched while the current one is consumed;
+        in stream mode repos are decoded one at a time instead. The
+        memoized `repos_payload` is neither used nor filled.
+        """
+        if self._stream:
+            repos = iter_json_items(self._public_repos_url, pool=self._pool)
+        else:
+            pages = iter_json_pages(self._public_repos_url, prefetch=True,
+                                    pool=self._pool)
+            repos = (repo for page in pages for repo in page)
+        for repo in operation_iter("iter_public_repos", repos):
+            if license is None or self.has_license(repo, license):
+                yield repo["name"]
 
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
         try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
+            has_license = _LICENSE_KEY(repo) == license_key
         except KeyError:
             return False
         return has_license
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Pluggable JSON decoders for get_json.
+The fastest installed parser is picked automatically, falling back to
+the standard library `json` module.
+"""
+import contextvars
+import importlib
+import json
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Union,
+)
+
+import requests
+
+__all__ = [
+    "JSONBackend",
+    "available_backends",
+    "current_backend",
+    "decode_response",
+    "get_backend",
+    "register_backend",
+    "set_backend",
+    "use_backend",
+]
+
+
+class JSONBackend(NamedTuple):
+    """A named JSON decoder accepting bytes or str.
+    """
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+
+
+def _orjson() -> Callable:
+    """orjson.loads"""
+    return importlib.import_module("orjson").loads
+
+
+def _ujson() -> Callable:
+    """ujson.loads"""
+    return importlib.import_module("ujson").loads
+
+
+def _rapidjson() -> Callable:
+    """rapidjson.loads, which only accepts str"""
+    loads = importlib.import_module("rapidjson").loads
+
+    def decode(data: Union[bytes, str]) -> Any:
+        """decode bytes before handing them to rapidjson"""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return loads(data)
+
+    return decode
+
+
+def _simplejson() -> Callable:
+    """simplejson.loads"""
+    return importlib.import_module("simplejson").loads
+
+
+# Fastest first; each factory raises ImportError when not installed.
+_FACTORIES = [
+    ("orjson", _orjson),
+    ("ujson", _ujson),
+    ("rapidjson", _rapidjson),
+    ("simplejson", _simplejson),
+    ("json", lambda: json.loads),
+]
+
+_backends = {}
+_loaded = False
+_default = None
+_current_backend = contextvars.ContextVar("current_backend", default=None)
+
+
+def register_backend(name: str, loads: Callable[[Union[bytes, str]], Any],
+                     preferred: bool = False) -> JSONBackend:
+    """Register a decoder under `name`.
+    A `preferred` backend becomes the default one.
+    """
+    global _default
+    backend = JSONBackend(name, loads)
+    _backends[name] = backend
+    if preferred:
+        _default = backend
+    return backend
+
+
+def _load_backends() -> Dict[str, JSONBackend]:
+    """Import every installed parser once"""
+    global _default, _loaded
+    if not _loaded:
+        for name, factory in _FACTORIES:
+            if name in _backends:
+                continue
+            try:
+                backend = register_backend(name, factory())
+            except ImportError:
+                continue
+            if _default is None:
+                _default = backend
+        _loaded = True
+    return _backends
+
+
+def available_backends() -> List[str]:
+    """Names of the installed backends, fastest first.
+    """
+    return list(_load_backends())
+
+
+def get_backend(name: str) -> JSONBackend:
+    """Return the installed backend called `name`.
+    """
+    try:
+        return _load_backends()[name]
+    except KeyError:
+        raise ValueError("JSON backend {!r} is not installed, "
+                         "available: {}".format(name, available_backends()))
+
+
+def set_backend(name: str) -> None:
+    """Make `name` the process-wide default backend.
+    """
+    global _default
+    _default = get_backend(name)
+
+
+def current_backend() -> JSONBackend:
+    """The backend in use in the current context.
+    """
+    backend = _current_backend.get()
+    if backend is None:
+        _load_backends()
+        backend = _default
+    return backend
+
+
+@contextmanager
+def use_backend(name: str) -> Iterator[JSONBackend]:
+    """Use the backend called `name` for the duration of the block.
+    """
+    token = _current_backend.set(get_backend(name))
+    try:
+        yield _current_backend.get()
+    finally:
+        _current_backend.reset(token)
+
+
+def decode_response(response: requests.Response) -> Any:
+    """Decode a response body with the current backend.
+    """
+    return current_backend().loads(response.content)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Pooled keep-alive HTTP sessions for the github org client.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    Optional,
+)
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = [
+    "SessionPool",
+    "current_pool",
+    "use_pool",
+]
+
+_current_pool = contextvars.ContextVar("current_pool", default=None)
+
+
+def current_pool() -> Optional["SessionPool"]:
+    """Return the pool active in the current context, if any.
+    """
+    return _current_pool.get()
+
+
+@contextmanager
+def use_pool(pool: Optional["SessionPool"]) -> Iterator[None]:
+    """Make `pool` the active pool for the duration of the block.
+    Passing None leaves the currently active pool untouched.
+    """
+    if pool is None:
+        yield
+        return
+    token = _current_pool.set(pool)
+    try:
+        yield
+    finally:
+        _current_pool.reset(token)
+
+
+class SessionPool:
+    """A keep-alive session with per-host connection pools.
+    Entering the pool opens the session and makes it the pool used by
+    `utils.get_json`; leaving it closes every pooled connection.
+    Example
+    -------
+    >>> with SessionPool(host_pool_sizes={"api.github.com": 32}) as pool:
+    ...     GithubOrgClient("google").public_repos()
+    ...     pool.stats()["api.github.com"]["reused"]
+    1
+    """
+
+    def __init__(self, pool_size: int = 10,
+                 host_pool_sizes: Dict[str, int] = None,
+                 block: bool = False) -> None:
+        """Init method of SessionPool
+        Parameters
+        ----------
+        pool_size: int
+            connections kept alive per host without an explicit size
+        host_pool_sizes: Dict[str, int]
+            connections kept alive for specific hosts
+        block: bool
+            wait for a free connection instead of opening extra ones
+        """
+        self._pool_size = pool_size
+        self._host_pool_sizes = dict(host_pool_sizes or {})
+        self._block = block
+        self._session = None
+        self._adapters = []
+        self._requests = {}
+        self._closed_connections = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    @property
+    def closed(self) -> bool:
+        """Whether the underlying session is closed"""
+        return self._session is None
+
+    def open(self) -> "SessionPool":
+        """Create the session and mount the per-host adapters.
+        """
+        if self._session is not None:
+            return self
+        session = requests.Session()
+        self._adapters = []
+        self._requests = {}
+        self._closed_connections = {}
+        default = self._adapter(self._pool_size)
+        session.mount("http://", default)
+        session.mount("https://", default)
+        for host, size in self._host_pool_sizes.items():
+            adapter = self._adapter(size)
+            session.mount("http://{}/".format(host), adapter)
+            session.mount("https://{}/".format(host), adapter)
+        self._session = session
+        return self
+
+    def close(self) -> None:
+        """Close the session and every pooled connection.
+        """
+        if self._session is not None:
+            self._closed_connections = self._connections()
+            self._session.close()
+            self._session = None
+
+    def __enter__(self) -> "SessionPool":
+        """Open the pool and make it the active one"""
+        self.open()
+        self._token = _current_pool.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Deactivate and close the pool"""
+        if self._token is not None:
+            _current_pool.reset(self._token)
+            self._token = None
+        self.close()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request over a pooled connection.
+        """
+        if self._session is None:
+            raise RuntimeError("SessionPool is closed")
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        return self._session.get(url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Connection reuse statistics per host.
+        Each host maps to the number of `requests` sent, the number of
+        `connections` opened for them and how many requests `reused` an
+        already open connection.
+        """
+        if self._session is None:
+            connections = self._closed_connections
+        else:
+            connections = self._connections()
+        with self._lock:
+            requests_by_host = dict(self._requests)
+        stats = {}
+        for host, sent in requests_by_host.items():
+            opened = connections.get(host, 0)
+            stats[host] = {
+                "requests": sent,
+                "connections": opened,
+                "reused": max(sent - opened, 0),
+            }
+        return stats
+
+    def _connections(self) -> Dict[str, int]:
+        """Count the connections opened by every live host pool"""
+        connections = {}
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                conn_pool = pools.get(key)
+                if conn_pool is None:
+                    continue
+                host = key.key_host
+                connections[host] = (connections.get(host, 0) +
+                                     conn_pool.num_connections)
+        return connections
+
+    def _adapter(self, size: int) -> HTTPAdapter:
+        """Build and remember an adapter keeping `size` connections"""
+        adapter = HTTPAdapter(pool_maxsize=size, pool_block=self._block)
+        self._adapters.append(adapter)
+        return adapter
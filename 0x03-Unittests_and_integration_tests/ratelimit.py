@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Rate-limit-aware request scheduling for the github org client.
+"""
+import asyncio
+import contextvars
+import email.utils
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+)
+
+import requests
+
+__all__ = [
+    "RateLimitExceeded",
+    "RateLimitScheduler",
+    "current_scheduler",
+    "rate_limited",
+]
+
+_current_scheduler = contextvars.ContextVar("current_scheduler",
+                                            default=None)
+
+
+def current_scheduler() -> Optional["RateLimitScheduler"]:
+    """Return the scheduler active in the current context, if any.
+    """
+    return _current_scheduler.get()
+
+
+class RateLimitExceeded(requests.HTTPError):
+    """Raised when a request is still rate limited once the scheduler's
+    wait budget is used up. `retry_after` is the pause it was asked for.
+    """
+
+    def __init__(self, *args, retry_after: float = None, **kwargs) -> None:
+        """Init method of RateLimitExceeded"""
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+def rate_limited(status: int, headers: Mapping[str, str],
+                 body: str = "") -> bool:
+    """Whether a response is GitHub refusing a request for its rate.
+    A 429 always is; a 403 is when its headers say so (`Retry-After`,
+    no `X-RateLimit-Remaining` left) or, for a secondary rate limit
+    sent without either, when its body does.
+    """
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    if headers.get("Retry-After") is not None:
+        return True
+    if _parse(headers.get("X-RateLimit-Remaining"), int) == 0:
+        return True
+    return "rate limit" in body.lower()
+
+
+def _parse(value: Optional[str], kind: Callable) -> Optional[float]:
+    """value converted with kind, None when missing or malformed"""
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, in seconds or as an
+    HTTP date; None when missing or malformed"""
+    seconds = _parse(value, float)
+    if seconds is not None or value is None:
+        return seconds
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+class RateLimitScheduler:
+    """A token bucket pacing requests to the GitHub rate limit.
+    The bucket refills at `rate` requests per second up to `burst`
+    tokens. Every response updates the pace from `X-RateLimit-Remaining`
+    and `X-RateLimit-Reset` so the remaining quota is spread evenly until
+    the reset; an exhausted quota, or a secondary rate limit answered
+    with `Retry-After`, pauses every caller until it is lifted. A
+    secondary rate limit saying nothing of when to retry pauses for
+    `backoff` seconds, doubling while it lasts. Threads block in
+    `acquire`, coroutines await `acquire_async`; get_json resends a
+    rate-limited request after the pause, and raises RateLimitExceeded
+    once it would have waited more than `max_wait` seconds in all.
+    Example
+    -------
+    >>> with RateLimitScheduler() as scheduler:
+    ...     GithubOrgClient("google").public_repos()
+    ...     scheduler.stats()["remaining"]
+    4998
+    """
+
+    def __init__(self, rate: float = 5000 / 3600, burst: int = 10,
+                 backoff: float = 60.0, max_wait: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """Init method of RateLimitScheduler
+        Parameters
+        ----------
+        rate: float
+            requests per second until the headers say otherwise; the
+            default is GitHub's authenticated limit of 5000 per hour
+        burst: int
+            requests that may be sent back to back
+        backoff: float
+            first pause after a secondary rate limit without headers
+        max_wait: float
+            seconds one request may wait before RateLimitExceeded
+        clock, sleep:
+            monotonic clock and blocking sleep, replaceable in tests
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._backoff = backoff
+        self._backoffs = 0
+        self._max_wait = max_wait
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._remaining = None
+        self._reset = None
+        self._queued = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self) -> "RateLimitScheduler":
+        """Make the scheduler the active one"""
+        self._token = _current_scheduler.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Deactivate the scheduler"""
+        if self._token is not None:
+            _current_scheduler.reset(self._token)
+            self._token = None
+
+    @property
+    def max_wait(self) -> float:
+        """Seconds one request may wait on rate limits in all"""
+        return self._max_wait
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; return the time waited.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                self._sleep(delay)
+            finally:
+                self._done_waiting()
+        return delay
+
+    async def acquire_async(self) -> float:
+        """Wait without blocking the loop until a request may be sent.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._done_waiting()
+        return delay
+
+    def update(self, headers: Mapping[str, str], status: int = 200,
+               limited: bool = None) -> float:
+        """Adjust the pace from the rate-limit headers of a response.
+        `limited` tells whether the response was rate limited, as
+        decided by `rate_limited` from the headers alone when None.
+        Returns the pause a rate-limited response imposes on every
+        caller, 0.0 when it was not rate limited. Malformed headers are
+        ignored.
+        """
+        remaining = _parse(headers.get("X-RateLimit-Remaining"), int)
+        reset = _parse(headers.get("X-RateLimit-Reset"), float)
+        retry_after = _retry_after(headers.get("Retry-After"))
+        if limited is None:
+            limited = rate_limited(status, headers)
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if remaining is not None and reset is not None:
+                self._remaining = remaining
+                self._reset = reset
+                window = max(self._reset - time.time(), 1.0)
+                if self._remaining <= 0:
+                    self._paused_until = max(self._paused_until,
+                                             now + window)
+                else:
+                    self._rate = self._remaining / window
+                self._tokens = min(self._tokens, float(self._remaining))
+            if not limited:
+                self._backoffs = 0
+                return 0.0
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until,
+                                         now + retry_after)
+            elif remaining is None or remaining > 0 or reset is None:
+                self._paused_until = max(
+                    self._paused_until,
+                    now + self._backoff * 2 ** self._backoffs)
+                self._backoffs += 1
+            return max(self._paused_until - now, 0.0)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Current budget, queue depth and wait times.
+        `tokens` may be negative while requests are queued; `paused_for`
+        is how long every request is held back by an exhausted quota or
+        a secondary rate limit.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return {
+                "tokens": self._tokens,
+                "rate": self._rate,
+                "remaining": self._remaining,
+                "reset": self._reset,
+                "queue_depth": self._queued,
+                "waits": self._waits,
+                "wait_seconds": self._wait_seconds,
+                "max_wait_seconds": self._max_wait_seconds,
+                "paused_for": max(self._paused_until - now, 0.0),
+            }
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last update"""
+        elapsed = max(now - self._updated, 0.0)
+        self._tokens = min(self._tokens + elapsed * self._rate,
+                           float(self._burst))
+        self._updated = now
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long to wait before using it"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1
+            delay = 0.0
+            if self._tokens < 0:
+                delay = -self._tokens / self._rate
+            delay = max(delay, self._paused_until - now)
+            if delay > 0:
+                self._queued += 1
+                self._waits += 1
+                self._wait_seconds += delay
+                self._max_wait_seconds = max(self._max_wait_seconds, delay)
+            return delay
+
+    def _done_waiting(self) -> None:
+        """Leave the queue"""
+        with self._lock:
+            self._queued -= 1
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Retries, circuit breakers and hedged requests for get_json.
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+)
+from urllib.parse import urlsplit
+
+import requests
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "Resilience",
+    "current_resilience",
+    "hedged",
+]
+
+_current_resilience = contextvars.ContextVar("current_resilience",
+                                             default=None)
+_hedging = contextvars.ContextVar("hedging", default=False)
+
+
+def current_resilience() -> Optional["Resilience"]:
+    """Return the resilience layer active in the current context, if any.
+    """
+    return _current_resilience.get()
+
+
+@contextmanager
+def hedged() -> Iterator[None]:
+    """Opt the requests of the block in to hedging, for the calls whose
+    tail latency matters.
+    """
+    token = _hedging.set(True)
+    try:
+        yield
+    finally:
+        _hedging.reset(token)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """Stop calling a host after repeated failures.
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail fast for `reset_timeout` seconds; then a single trial
+    request is let through (half open) and its outcome closes or reopens
+    the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """Init method of CircuitBreaker"""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" or "half_open"."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at < self._reset_timeout:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._clock() - self._opened_at < self._reset_timeout:
+                return False
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit.
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit past the threshold.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self._failure_threshold:
+                self._opened_at = self._clock()
+            self._trial = False
+
+    def release_trial(self) -> None:
+        """Let another trial through after one ended without an answer
+        from the host, leaving the failure count alone.
+        """
+        with self._lock:
+            self._trial = False
+
+
+class Resilience:
+    """Bounded retries with decorrelated jitter, per-host circuit
+    breakers and optional hedged requests around every GET.
+    A connection error, a timeout or a status in `retry_statuses` is
+    retried up to `max_attempts` in total, sleeping between attempts
+    for a random time between `base_delay` and three times the previous
+    sleep, capped at `max_delay`. With `hedge_after`, the requests that
+    opt in (`call(..., hedge=True)`, or any made inside a `hedged()`
+    block) get a second identical request when the first has not
+    answered after that many seconds, and the first answer wins.
+    Example
+    -------
+    >>> with Resilience(max_attempts=3, hedge_after=0.5) as resilience:
+    ...     scan = list(scan_orgs(orgs))
+    ...     with hedged():
+    ...         GithubOrgClient("google").org
+    ...     resilience.stats()["retries"]
+    2
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.1,
+                 max_delay: float = 10.0,
+                 retry_statuses: Sequence[int] = (500, 502, 503, 504),
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 hedge_after: float = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: random.Random = None) -> None:
+        """Init method of Resilience"""
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._retry_statuses = frozenset(retry_statuses)
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._hedge_after = hedge_after
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._breakers = {}
+        self._latencies = deque(maxlen=10000)
+        self._counters = {"attempts": 0, "retries": 0, "successes": 0,
+                          "failures": 0, "short_circuited": 0,
+                          "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._token = None
+
+    def __enter__(self) -> "Resilience":
+        """Make the layer the active one"""
+        self._token = _current_resilience.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Deactivate the layer"""
+        if self._token is not None:
+            _current_resilience.reset(self._token)
+            self._token = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """The circuit breaker of the host of url.
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    self._failure_threshold, self._reset_timeout)
+            return self._breakers[host]
+
+    def call(self, url: str, send: Callable[[], requests.Response],
+             hedge: bool = None) -> requests.Response:
+        """Send a request with `send()`, retrying transient failures.
+        The last response is returned when every attempt got a
+        retryable status; the last exception is raised when every
+        attempt failed to connect. `hedge` opts the request in to
+        hedging; when None, it is hedged inside a `hedged()` block.
+        Any other `requests.RequestException` is raised at once, as a
+        failure of the host; anything else (a bug in `send`, an
+        interrupt) is raised without counting against the host.
+        """
+        if hedge is None:
+            hedge = _hedging.get()
+        breaker = self.breaker(url)
+        delay = self._base_delay
+        for attempt in range(1, self._max_attempts + 1):
+            if not breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpenError(
+                    "circuit open for {}".format(urlsplit(url).netloc))
+            last = attempt == self._max_attempts
+            try:
+                response = self._attempt(send, hedge)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                self._count("failures")
+                if last:
+                    raise
+            except requests.RequestException:
+                breaker.record_failure()
+                self._count("failures")
+                raise
+            except BaseException:
+                breaker.release_trial()
+                raise
+            else:
+                if response.status_code not in self._retry_statuses:
+                    breaker.record_success()
+                    self._count("successes")
+                    return response
+                breaker.record_failure()
+                self._count("failures")
+                if last:
+                    return response
+                response.close()
+            self._count("retries")
+            delay = min(self._max_delay,
+                        self._rng.uniform(self._base_delay, delay * 3))
+            self._sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        """Attempt, retry, success, failure, short-circuit and hedge
+        counters, with per-attempt latency percentiles in seconds.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+        for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            stats["latency_" + name] = latencies[
+                min(int(fraction * len(latencies)), len(latencies) - 1)
+            ] if latencies else None
+        return stats
+
+    def _attempt(self, send: Callable[[], requests.Response],
+                 hedge: bool) -> requests.Response:
+        """One timed attempt, hedged when asked and configured"""
+        self._count("attempts")
+        start = time.perf_counter()
+        try:
+            if not hedge or self._hedge_after is None:
+                return send()
+            return self._hedged(send)
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+
+    def _hedged(self, send: Callable[[], requests.Response]
+                ) -> requests.Response:
+        """Race a second request against a slow first one"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=64)
+            executor = self._executor
+        first = executor.submit(contextvars.copy_context().run, send)
+        done, _ = wait([first], timeout=self._hedge_after)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = executor.submit(contextvars.copy_context().run, send)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done
+                           if future.exception() is None), None)
+            if winner is None:
+                if pending:
+                    continue
+                winner = done.pop()
+            for loser in pending:
+                loser.add_done_callback(_close_result)
+            if winner is second:
+                self._count("hedge_wins")
+            return winner.result()
+
+    def _count(self, counter: str) -> None:
+        """Increment one of the counters"""
+        with self._lock:
+            self._counters[counter] += 1
+
+
+def _close_result(future) -> None:
+    """Close the response of a hedged request that lost the race"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
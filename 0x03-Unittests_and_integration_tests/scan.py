@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Batch scanning of many github orgs over a worker pool.
+"""
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+import requests
+
+from client import GithubOrgClient
+from pool import SessionPool, current_pool
+
+__all__ = [
+    "OrgScan",
+    "scan_orgs",
+]
+
+
+class OrgScan(NamedTuple):
+    """The outcome of scanning one org.
+    `repos` is None and `error` is set when the org could not be
+    fetched. `elapsed` is the time spent on this org, `completed` and
+    `orgs_per_second` describe the whole scan when it finished.
+    """
+    org: str
+    repos: Optional[List[str]]
+    error: Optional[Exception]
+    elapsed: float
+    completed: int
+    orgs_per_second: float
+
+
+def _scan_one(org: str, license: Optional[str],
+              pool: SessionPool) -> tuple:
+    """Fetch the public repos of one org, timing it"""
+    start = time.perf_counter()
+    try:
+        repos = GithubOrgClient(org, pool=pool).public_repos(license)
+        error = None
+    except Exception as exc:
+        repos, error = None, exc
+    return repos, error, time.perf_counter() - start
+
+
+def _org_url(org: str) -> str:
+    """The org URL as requests would send it, lowercased since GitHub
+    org names are case-insensitive"""
+    url = GithubOrgClient.ORG_URL.format(org=org)
+    return requests.Request("GET", url).prepare().url.lower()
+
+
+def scan_orgs(orgs: Iterable[str], license: str = None, workers: int = 8,
+              pool: SessionPool = None) -> Iterator[OrgScan]:
+    """Scan many orgs concurrently and yield each result as it finishes.
+    Orgs resolving to the same URL (names are case-insensitive) are
+    fetched once. `orgs` is consumed lazily: at most `workers * 2` orgs
+    are in flight, and the next one is submitted as each finishes. A
+    failing org is reported through `OrgScan.error`
+    instead of aborting the batch. Requests go through `pool`, else the
+    active pool, else a pool opened for the duration of the scan with
+    one connection per worker. For an event-loop based scan see
+    `async_client.gather_public_repos`.
+    Example
+    -------
+    >>> for result in scan_orgs(["google", "abc"], "apache-2.0"):
+    ...     print(result.org, result.repos, result.orgs_per_second)
+    """
+    own_pool = None
+    if pool is None and current_pool() is None:
+        pool = own_pool = SessionPool(pool_size=workers).open()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    orgs = iter(orgs)
+    seen = set()
+
+    def submit_next() -> bool:
+        """Submit the next org not seen yet, False when none is left"""
+        for org in orgs:
+            url = _org_url(org)
+            if url in seen:
+                continue
+            seen.add(url)
+            future = executor.submit(contextvars.copy_context().run,
+                                     _scan_one, org, license, pool)
+            futures[future] = org
+            return True
+        return False
+
+    try:
+        start = time.perf_counter()
+        while len(futures) < workers * 2 and submit_next():
+            pass
+        completed = 0
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                org = futures.pop(future)
+                repos, error, elapsed = future.result()
+                completed += 1
+                total = time.perf_counter() - start
+                yield OrgScan(org, repos, error, elapsed,
+                              completed, completed / total)
+                submit_next()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+        if own_pool is not None:
+            own_pool.close()
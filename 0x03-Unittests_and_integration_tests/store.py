@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Persistent org and repo snapshots for a fast cold start.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from json_backends import current_backend
+from sync import RepoSnapshot
+from utils import compile_path
+
+__all__ = [
+    "SnapshotStore",
+]
+
+_LICENSE_KEY = compile_path(("license", "key"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orgs (
+    org TEXT PRIMARY KEY,
+    payload BLOB,
+    cursor TEXT,
+    synced REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repos (
+    org TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    license_key TEXT,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (org, id)
+);
+CREATE INDEX IF NOT EXISTS repos_position ON repos (org, position);
+CREATE INDEX IF NOT EXISTS repos_name ON repos (org, name);
+CREATE INDEX IF NOT EXISTS repos_license
+    ON repos (org, license_key, position);
+"""
+
+
+class SnapshotStore:
+    """An SQLite file of org payloads and their repos.
+    Repos are stored with their name and license key in indexed columns
+    next to the zlib-compressed payload, so `public_repos` answers
+    straight from the indexes without decoding any JSON. `save` writes
+    only the repos the last sync of the snapshot changed. Org names are
+    matched case-insensitively.
+    Example
+    -------
+    >>> with SnapshotStore("github.sqlite") as store:
+    ...     GithubOrgClient("google", store=store).sync()
+    >>> # later, in a fresh process, without network
+    >>> with SnapshotStore("github.sqlite") as store:
+    ...     GithubOrgClient("google", store=store).public_repos("apache-2.0")
+    ['dagger', 'kratu', 'traceur-compiler', 'firmata.py']
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """Init method of SnapshotStore
+        Parameters
+        ----------
+        path: str
+            sqlite database file, ":memory:" keeps nothing on disk
+        """
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SnapshotStore":
+        """Return the store"""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the store"""
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def orgs(self) -> List[str]:
+        """The stored org names.
+        """
+        with self._lock:
+            return [org for org, in self._db.execute(
+                "SELECT org FROM orgs ORDER BY org")]
+
+    def org_payload(self, org: str) -> Optional[Dict]:
+        """The stored org payload, None when the org is unknown.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM orgs WHERE org = ?",
+                                   (org.lower(),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return current_backend().loads(row[0])
+
+    def public_repos(self, org: str,
+                     license: str = None) -> Optional[List[str]]:
+        """Names of the stored repos of org, optionally by license key.
+        None when no repos of the org were ever saved.
+        """
+        org = org.lower()
+        with self._lock:
+            row = self._db.execute("SELECT cursor FROM orgs WHERE org = ?",
+                                   (org,)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            if license is None:
+                rows = self._db.execute(
+                    "SELECT name FROM repos WHERE org = ? ORDER BY position",
+                    (org,))
+            else:
+                rows = self._db.execute(
+                    "SELECT name FROM repos WHERE org = ? AND license_key = ?"
+                    " ORDER BY position", (org, license))
+            return [name for name, in rows]
+
+    def snapshot(self, org: str, full_every: int = None) -> RepoSnapshot:
+        """A RepoSnapshot holding the stored repos of org, to be synced
+        incrementally from the stored cursor.
+        """
+        org = org.lower()
+        loads = current_backend().loads
+        with self._lock:
+            row = self._db.execute("SELECT cursor FROM orgs WHERE org = ?",
+                                   (org,)).fetchone()
+            repos = [loads(zlib.decompress(payload))
+                     for payload, in self._db.execute(
+                "SELECT payload FROM repos WHERE org = ? ORDER BY position",
+                (org,))]
+        return RepoSnapshot(repos, row[0] or None if row else None,
+                            full_every)
+
+    def save(self, org: str, snapshot: RepoSnapshot = None,
+             org_payload: Dict = None) -> int:
+        """Persist the org payload and the changes of the last sync of
+        snapshot; returns the number of repos written.
+        """
+        org = org.lower()
+        rows = []
+        full = False
+        if snapshot is not None:
+            full, changed = snapshot.changes()
+            keys = {RepoSnapshot.key(repo): position for position, repo
+                    in enumerate(snapshot.repos())}
+            for repo in changed:
+                try:
+                    license_key = _LICENSE_KEY(repo)
+                except KeyError:
+                    license_key = None
+                key = RepoSnapshot.key(repo)
+                rows.append((org, str(key), keys[key], repo["name"],
+                             license_key,
+                             zlib.compress(json.dumps(repo).encode())))
+        with self._lock:
+            if snapshot is not None and full:
+                self._db.execute("DELETE FROM repos WHERE org = ?", (org,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+            # no upsert: ON CONFLICT needs SQLite 3.24, Ubuntu 18.04 has 3.22
+            row = (None if org_payload is None
+                   else json.dumps(org_payload).encode(),
+                   None if snapshot is None else snapshot.cursor or "",
+                   time.time())
+            updated = self._db.execute(
+                "UPDATE orgs SET payload = COALESCE(?, payload), "
+                "cursor = COALESCE(?, cursor), synced = ? WHERE org = ?",
+                row + (org,)).rowcount
+            if not updated:
+                self._db.execute("INSERT INTO orgs VALUES (?, ?, ?, ?)",
+                                 (org,) + row)
+            self._db.commit()
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Stored `orgs` and `repos`, and the database size in `bytes`.
+        """
+        with self._lock:
+            orgs, = self._db.execute("SELECT COUNT(*) FROM orgs").fetchone()
+            repos, = self._db.execute(
+                "SELECT COUNT(*) FROM repos").fetchone()
+            pages, = self._db.execute("PRAGMA page_count").fetchone()
+            size, = self._db.execute("PRAGMA page_size").fetchone()
+        return {"orgs": orgs, "repos": repos, "bytes": pages * size}
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""A local stand-in for the GitHub API, built from fixtures.TEST_PAYLOAD.
+Run it directly to serve the fixtures on http://127.0.0.1:8000.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+)
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from client import GithubOrgClient
+from fixtures import TEST_PAYLOAD
+
+__all__ = [
+    "StubGithubServer",
+    "measure_throughput",
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer the org and repos endpoints of StubGithubServer"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        """Serve /orgs/{org} and /orgs/{org}/repos"""
+        self.server.stub.handle(self)
+
+    def log_message(self, *args) -> None:
+        """Keep the stub quiet"""
+
+
+class StubGithubServer:
+    """Serve GitHub-shaped org and repos payloads from a local socket.
+    The fixture orgs are served out of the box and more orgs, real or
+    synthetic, can be added. Repos listings are paginated with `Link`
+    headers and follow `sort`/`direction` on `updated`, `pushed` and
+    `created`; every answer carries an `ETag` honoured through
+    `If-None-Match`, and `X-RateLimit-*` headers count down a quota.
+    `latency` delays every answer and a seeded `error_rate` fraction of
+    requests fails with `error_status`. The last `cached_pages` encoded
+    repos pages are kept so that benchmarks time the client rather than
+    the stub.
+    Example
+    -------
+    >>> with StubGithubServer(page_size=2, latency=0.01) as server:
+    ...     server.client("google").public_repos("apache-2.0")
+    ['dagger', 'kratu', 'traceur-compiler', 'firmata.py']
+    """
+
+    def __init__(self, page_size: int = 30, latency: float = 0.0,
+                 rate_limit: int = 5000, rate_limit_window: int = 3600,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 seed: int = 0, cached_pages: int = 64,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        """Init method of StubGithubServer"""
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rate_limit = rate_limit
+        self._rate_limit_window = rate_limit_window
+        self._remaining = rate_limit
+        self._reset = int(time.time()) + rate_limit_window
+        self._rng = random.Random(seed)
+        self._orgs = {}
+        self._pages = OrderedDict()
+        self._orders = {}
+        self._cached_pages = cached_pages
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "not_modified": 0, "errors": 0,
+                          "rate_limited": 0, "not_found": 0}
+        self._address = (host, port)
+        self._server = None
+        self._thread = None
+        for org_payload, repos, _, _ in TEST_PAYLOAD:
+            name = urlsplit(org_payload["repos_url"]).path.split("/")[2]
+            self.add_org(name, repos, org_payload)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server"""
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def org_url(self) -> str:
+        """ORG_URL template pointing at this server"""
+        return self.url + "/orgs/{org}"
+
+    def add_org(self, name: str, repos: Sequence[Dict],
+                org_payload: Dict = None) -> None:
+        """Serve `repos` as the public repos of org `name`.
+        `repos` only needs `len()` and slicing, so a lazy sequence
+        keeps huge synthetic orgs out of memory.
+        """
+        payload = dict(org_payload or {"login": name})
+        with self._lock:
+            self._orgs[name.lower()] = (payload, repos)
+            self._pages.clear()
+            self._orders.clear()
+
+    def client(self, org: str, **kwargs: Any) -> GithubOrgClient:
+        """A GithubOrgClient talking to this server.
+        """
+        client = GithubOrgClient(org, **kwargs)
+        client.ORG_URL = self.org_url
+        return client
+
+    def start(self) -> "StubGithubServer":
+        """Start serving in a background thread.
+        """
+        self._server = ThreadingHTTPServer(self._address, _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StubGithubServer":
+        """Start the server"""
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop the server"""
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Requests served, 304s, injected errors, rate-limited and
+        not found answers, and the remaining quota.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["rate_limit_remaining"] = self._remaining
+        return stats
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        """Answer one request"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._counters["requests"] += 1
+            now = time.time()
+            if now >= self._reset:
+                self._remaining = self._rate_limit
+                self._reset = int(now) + self._rate_limit_window
+            limited = self._remaining <= 0
+            if not limited:
+                self._remaining -= 1
+            failed = self._rng.random() < self.error_rate
+            headers = {
+                "X-RateLimit-Limit": str(self._rate_limit),
+                "X-RateLimit-Remaining": str(self._remaining),
+                "X-RateLimit-Reset": str(self._reset),
+            }
+        if limited:
+            self._count("rate_limited")
+            return self._send(request, 403, headers, {
+                "message": "API rate limit exceeded"})
+        if failed:
+            self._count("errors")
+            return self._send(request, self.error_status, headers, {
+                "message": "injected failure"})
+
+        parts = urlsplit(request.path)
+        segments = parts.path.strip("/").split("/")
+        org = self._orgs.get(segments[1].lower()) \
+            if len(segments) in (2, 3) and segments[0] == "orgs" else None
+        if org is None or (len(segments) == 3 and segments[2] != "repos"):
+            self._count("not_found")
+            return self._send(request, 404, headers, {"message": "Not Found"})
+        org_payload, repos = org
+        base = "{}/orgs/{}".format(self.url, segments[1])
+        if len(segments) == 2:
+            body = dict(org_payload, repos_url=base + "/repos")
+            return self._send(request, 200, headers, body)
+
+        query = parse_qs(parts.query)
+        page = max(int(query.get("page", ["1"])[0]), 1)
+        per_page = int(query.get("per_page", [str(self.page_size)])[0])
+        sort = query.get("sort", [None])[0]
+        direction = query.get("direction", [
+            "asc" if sort in (None, "full_name") else "desc"])[0]
+        last = max((len(repos) + per_page - 1) // per_page, 1)
+        links = []
+        for rel, number in (("next", page + 1), ("last", last)):
+            if rel == "next" and page >= last:
+                continue
+            params = {"page": number, "per_page": per_page}
+            if sort is not None:
+                params.update(sort=sort, direction=direction)
+            links.append('<{}/repos?{}>; rel="{}"'.format(
+                base, urlencode(params), rel))
+        headers["Link"] = ", ".join(links)
+        key = (segments[1].lower(), page, per_page, sort, direction)
+        with self._lock:
+            raw = self._pages.get(key)
+            if raw is not None:
+                self._pages.move_to_end(key)
+        if raw is None:
+            start, stop = (page - 1) * per_page, page * per_page
+            if sort in ("updated", "pushed", "created"):
+                order = self._order(segments[1].lower(), sort + "_at",
+                                    direction == "desc")
+                body = [repos[i] for i in order[start:stop]]
+            else:
+                body = list(repos[start:stop])
+            raw = json.dumps(body).encode()
+            with self._lock:
+                self._pages[key] = raw
+                while len(self._pages) > self._cached_pages:
+                    self._pages.popitem(last=False)
+        return self._send(request, 200, headers, raw=raw)
+
+    def _order(self, org: str, field: str, reverse: bool) -> List[int]:
+        """Indexes of the repos of org sorted on field"""
+        key = (org, field, reverse)
+        with self._lock:
+            order = self._orders.get(key)
+            repos = self._orgs[org][1]
+        if order is None:
+            order = sorted(range(len(repos)),
+                           key=lambda i: repos[i].get(field) or "",
+                           reverse=reverse)
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def _send(self, request: BaseHTTPRequestHandler, status: int,
+              headers: Dict[str, str], body: Any = None,
+              raw: bytes = None) -> None:
+        """Write a JSON answer, or a 304 when the ETag matches"""
+        if raw is None:
+            raw = json.dumps(body).encode()
+        etag = '"{}"'.format(hashlib.sha1(raw).hexdigest())
+        if status == 200 and request.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            status, raw = 304, b""
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        if status in (200, 304):
+            request.send_header("ETag", etag)
+        if status != 304:
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(raw)))
+        request.end_headers()
+        request.wfile.write(raw)
+
+    def _count(self, counter: str) -> None:
+        """Increment one of the counters"""
+        with self._lock:
+            self._counters[counter] += 1
+
+
+def measure_throughput(server: StubGithubServer, orgs: Iterable[str],
+                       license: str = None, rounds: int = 1,
+                       **kwargs: Any) -> Dict[str, float]:
+    """Time `public_repos(license)` of fresh clients against `server`.
+    Every round builds new clients so nothing is memoized between
+    rounds; `kwargs` go to GithubOrgClient. Requests and repos per
+    second are measured end to end, sockets and decoding included.
+    """
+    orgs = list(orgs)
+    before = server.stats()["requests"]
+    repos = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for org in orgs:
+            repos += len(server.client(org, **kwargs).public_repos(license))
+    elapsed = time.perf_counter() - start
+    requests = server.stats()["requests"] - before
+    return {
+        "requests": requests,
+        "repos": repos,
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "repos_per_second": repos / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    from pool import SessionPool
+    from synthetic import SyntheticOrg
+
+    with StubGithubServer(page_size=100) as server:
+        synthetic = SyntheticOrg("synthetic", 3000)
+        server.add_org(synthetic.login, synthetic, synthetic.org_payload)
+        orgs = ["google", "synthetic"]
+        print("{:<13}{:>12}{:>14}".format("", "req/s", "repos/s"))
+        result = measure_throughput(server, orgs, rounds=5)
+        print("{:<13}{requests_per_second:>12.0f}"
+              "{repos_per_second:>14.0f}".format("requests.get", **result))
+        with SessionPool() as pool:
+            result = measure_throughput(server, orgs, rounds=5, pool=pool)
+        print("{:<13}{requests_per_second:>12.0f}"
+              "{repos_per_second:>14.0f}".format("SessionPool", **result))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Incremental sync of an org's repos listing.
+"""
+import threading
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pool import SessionPool
+from tracing import operation_iter
+from utils import iter_json_pages
+
+__all__ = [
+    "RepoSnapshot",
+]
+
+
+class RepoSnapshot:
+    """A local copy of one org's repos, kept current incrementally.
+    The first `sync` reads the whole listing. Later ones read it sorted
+    by `updated_at`, newest first, and stop at the first repo older
+    than the cursor (the newest `updated_at` seen so far), so a refresh
+    costs pages in proportion to the repos that changed rather than to
+    the size of the org. Changed repos replace their previous version in
+    place, keyed on their id, and new ones are appended. Deleted repos
+    only disappear on a full sync: every `full_every`-th sync is one,
+    and `sync(full=True)` forces one.
+    Example
+    -------
+    >>> client = GithubOrgClient("google", snapshot=RepoSnapshot())
+    >>> len(client.public_repos())
+    9
+    >>> client.sync()["fetched"]
+    1
+    """
+
+    def __init__(self, repos: Iterable[Dict] = (), cursor: str = None,
+                 full_every: int = None) -> None:
+        """Init method of RepoSnapshot"""
+        self._repos = {}
+        for repo in repos:
+            self._repos[self.key(repo)] = repo
+        self._cursor = cursor
+        if cursor is None and self._repos:
+            self._cursor = max(self._updated(repo)
+                               for repo in self._repos.values())
+        self._full_every = full_every
+        self._full_requested = False
+        self._changed = list(self._repos)
+        self._full = True
+        self._syncs = 0
+        self._full_syncs = 0
+        self._last = {"pages": 0, "fetched": 0, "changed": 0, "added": 0,
+                      "removed": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self) -> Optional[str]:
+        """The newest `updated_at` in the snapshot"""
+        return self._cursor
+
+    def repos(self) -> List[Dict]:
+        """The repos of the snapshot, in listing order.
+        """
+        with self._lock:
+            return list(self._repos.values())
+
+    def sync(self, url: str, full: bool = False,
+             pool: SessionPool = None) -> List[Dict]:
+        """Bring the snapshot up to date with the repos listing at url.
+        Returns the repos, in listing order. Requests go through `pool`
+        when given.
+        """
+        with self._lock:
+            full = full or self._full_requested or self._cursor is None or (
+                self._full_every is not None and
+                self._syncs % self._full_every == self._full_every - 1)
+            self._full_requested = False
+            if full:
+                self._full_sync(url, pool)
+            else:
+                self._incremental_sync(url, pool)
+            self._syncs += 1
+            return list(self._repos.values())
+
+    def changes(self) -> Tuple[bool, List[Dict]]:
+        """What the last sync did: whether it replaced every repo, and
+        the repos it added or updated.
+        """
+        with self._lock:
+            return self._full, [self._repos[key] for key in self._changed]
+
+    def request_full_sync(self) -> None:
+        """Make the next sync a full one.
+        """
+        self._full_requested = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, cursor and sync counters, with what the last sync
+        fetched: `pages`, `fetched` repos and how many of them were
+        `changed`, `added` or `removed`.
+        """
+        with self._lock:
+            stats = dict(self._last)
+            stats.update({"repos": len(self._repos), "cursor": self._cursor,
+                          "syncs": self._syncs,
+                          "full_syncs": self._full_syncs})
+            return stats
+
+    def _full_sync(self, url: str, pool: Optional[SessionPool]) -> None:
+        """Replace the snapshot with the whole listing"""
+        repos = {}
+        pages = 0
+        for page in operation_iter("sync", iter_json_pages(url, pool=pool)):
+            pages += 1
+            for repo in page:
+                repos[self.key(repo)] = repo
+        added = len(repos.keys() - self._repos.keys())
+        removed = len(self._repos.keys() - repos.keys())
+        changed = sum(1 for key, repo in repos.items()
+                      if key in self._repos and self._repos[key] != repo)
+        self._repos = repos
+        self._changed = list(repos)
+        self._full = True
+        self._cursor = max((self._updated(repo) for repo in repos.values()),
+                           default=None)
+        self._full_syncs += 1
+        self._last = {"pages": pages, "fetched": len(repos),
+                      "changed": changed, "added": added,
+                      "removed": removed}
+
+    def _incremental_sync(self, url: str,
+                          pool: Optional[SessionPool]) -> None:
+        """Merge the repos updated since the cursor"""
+        separator = "&" if "?" in url else "?"
+        pages = iter_json_pages(
+            url + separator + "sort=updated&direction=desc", pool=pool)
+        fetched = changed = added = 0
+        count = 0
+        self._changed = []
+        self._full = False
+        newest = self._cursor
+        for page in operation_iter("sync", pages):
+            count += 1
+            done = False
+            for repo in page:
+                updated = self._updated(repo)
+                if updated < self._cursor:
+                    done = True
+                    break
+                fetched += 1
+                newest = max(newest, updated)
+                key = self.key(repo)
+                previous = self._repos.get(key)
+                if previous is None:
+                    added += 1
+                elif previous != repo:
+                    changed += 1
+                else:
+                    continue
+                self._repos[key] = repo
+                self._changed.append(key)
+            if done:
+                break
+        pages.close()
+        self._cursor = newest
+        self._last = {"pages": count, "fetched": fetched,
+                      "changed": changed, "added": added, "removed": 0}
+
+    @staticmethod
+    def key(repo: Dict) -> Any:
+        """Identity of a repo across renames: its id, else its name.
+        """
+        return repo.get("id", repo.get("name"))
+
+    @staticmethod
+    def _updated(repo: Dict) -> str:
+        """`updated_at` of a repo; ISO 8601 strings sort by time"""
+        return repo.get("updated_at") or ""
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Seeded GitHub-shaped org and repos payloads of any size.
+Run it directly to write a repos listing to disk:
+    ./synthetic.py 50000 repos.json --seed 1
+"""
+import json
+import random
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from fixtures import TEST_PAYLOAD
+
+__all__ = [
+    "DEFAULT_LICENSES",
+    "SyntheticOrg",
+]
+
+DEFAULT_LICENSES = {
+    "mit": 0.35,
+    "apache-2.0": 0.25,
+    None: 0.2,
+    "gpl-3.0": 0.1,
+    "bsd-3-clause": 0.06,
+    "other": 0.04,
+}
+"""Share of repos per license key; None is an unlicensed repo."""
+
+_LICENSE_NAMES = {
+    "mit": ("MIT License", "MIT"),
+    "apache-2.0": ("Apache License 2.0", "Apache-2.0"),
+    "gpl-3.0": ("GNU General Public License v3.0", "GPL-3.0"),
+    "bsd-3-clause": ('BSD 3-Clause "New" or "Revised" License',
+                     "BSD-3-Clause"),
+    "other": ("Other", "NOASSERTION"),
+}
+
+_LANGUAGES = ["Python", "Go", "Java", "JavaScript", "C++", "Dart", "Rust",
+              "TypeScript", None]
+
+_WORDS = ["fast", "tiny", "cloud", "data", "graph", "proto", "lint", "kit",
+          "flow", "core", "web", "test", "build", "cache", "sync", "map"]
+
+_EPOCH = datetime(2010, 1, 1, tzinfo=timezone.utc)
+
+_TEMPLATE = TEST_PAYLOAD[0][1][0]
+_TEMPLATE_REPO = "/" + _TEMPLATE["full_name"]
+_REPO_URLS = [(key, value.split(_TEMPLATE_REPO, 1))
+              for key, value in _TEMPLATE.items()
+              if key.endswith("url") and _TEMPLATE_REPO in str(value)]
+_OWNER_URLS = [(key, value.split("/" + _TEMPLATE["owner"]["login"], 1))
+               for key, value in _TEMPLATE["owner"].items()
+               if key.endswith("url") and value.startswith("https://api.")]
+
+
+class SyntheticOrg(Sequence):
+    """The public repos of an imaginary org, generated on demand.
+    Repo `i` is derived from `seed`, the org login and `i` alone, so
+    the same arguments give the same payloads in any process and any
+    slice can be built without the ones before it; nothing is kept in
+    memory. Repos carry every field of the fixture repos. `licenses`
+    maps license keys (None for no license) to their share of repos,
+    `description_size` sets the length of descriptions and `topics` the
+    number of topics per repo.
+    Example
+    -------
+    >>> org = SyntheticOrg("acme", 50000, seed=1)
+    >>> org[123]["license"]["key"]
+    'mit'
+    >>> with StubGithubServer() as server:
+    ...     server.add_org(org.login, org, org.org_payload)
+    ...     len(server.client("acme").public_repos())
+    50000
+    """
+
+    def __init__(self, login: str = "synthetic", repos: int = 1000,
+                 seed: int = 0,
+                 licenses: Mapping[Optional[str], float] = None,
+                 description_size: int = 60, topics: int = 0,
+                 base_url: str = "https://api.github.com") -> None:
+        """Init method of SyntheticOrg"""
+        self.login = login
+        self.seed = seed
+        self.description_size = description_size
+        self.topics = topics
+        self._count = repos
+        self._base_url = base_url
+        licenses = DEFAULT_LICENSES if licenses is None else licenses
+        self._license_keys = list(licenses)
+        self._license_weights = [licenses[key] for key in self._license_keys]
+        self._org_id = random.Random("{}:{}".format(seed, login)).randrange(
+            10 ** 6, 10 ** 8)
+        self._owner = self._make_owner()
+
+    @property
+    def org_payload(self) -> Dict[str, Any]:
+        """The payload of the org endpoint"""
+        return {
+            "login": self.login,
+            "id": self._org_id,
+            "url": "{}/orgs/{}".format(self._base_url, self.login),
+            "repos_url": "{}/orgs/{}/repos".format(self._base_url,
+                                                   self.login),
+            "public_repos": self._count,
+            "type": "Organization",
+        }
+
+    def __len__(self) -> int:
+        """Number of repos"""
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]
+                    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """Repo `index`, or a list of repos for a slice"""
+        if isinstance(index, slice):
+            return [self._make_repo(i)
+                    for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("repo index out of range")
+        return self._make_repo(index)
+
+    def license_at(self, index: int) -> Optional[str]:
+        """The license key of repo `index`, without building the repo.
+        """
+        return self._identity(index)[1]
+
+    def expected_repos(self, license: str = None) -> Iterator[str]:
+        """Names of the repos public_repos(license) should return.
+        """
+        for i in range(self._count):
+            _, license_key, name = self._identity(i)
+            if license is None or license_key == license:
+                yield name
+
+    def iter_json(self, batch: int = 500) -> Iterator[bytes]:
+        """The repos listing as JSON, encoded `batch` repos at a time.
+        """
+        yield b"["
+        for start in range(0, self._count, batch):
+            repos = self[start:start + batch]
+            chunk = ",".join(json.dumps(repo) for repo in repos)
+            yield (chunk if start == 0 else "," + chunk).encode()
+        yield b"]"
+
+    def write(self, target: Union[str, BinaryIO], batch: int = 500) -> int:
+        """Stream the repos listing to a path or binary file.
+        Returns the number of bytes written.
+        """
+        if isinstance(target, str):
+            with open(target, "wb") as stream:
+                return self.write(stream, batch)
+        written = 0
+        for chunk in self.iter_json(batch):
+            target.write(chunk)
+            written += len(chunk)
+        return written
+
+    def _identity(self, index: int
+                  ) -> Tuple[random.Random, Optional[str], str]:
+        """The generator, license key and name of repo `index`"""
+        rng = random.Random("{}:{}:{}".format(self.seed, self.login, index))
+        license_key = rng.choices(self._license_keys,
+                                  self._license_weights)[0]
+        name = "{}-{}-{}".format(rng.choice(_WORDS), rng.choice(_WORDS),
+                                 index)
+        return rng, license_key, name
+
+    def _make_owner(self) -> Dict[str, Any]:
+        """The owner object shared by every repo"""
+        owner = dict(_TEMPLATE["owner"], login=self.login, id=self._org_id,
+                     html_url="https://github.com/" + self.login,
+                     avatar_url="https://avatars.githubusercontent.com/"
+                                "u/{}?v=4".format(self._org_id))
+        for key, (prefix, suffix) in _OWNER_URLS:
+            owner[key] = "{}/{}{}".format(prefix, self.login, suffix)
+        return owner
+
+    def _make_repo(self, index: int) -> Dict[str, Any]:
+        """Build repo `index`"""
+        rng, license_key, name = self._identity(index)
+        full_name = "{}/{}".format(self.login, name)
+        created = _EPOCH + timedelta(seconds=rng.randrange(3 * 10 ** 8))
+        updated = created + timedelta(seconds=rng.randrange(10 ** 8))
+        stars = int(rng.paretovariate(1.2)) - 1
+        forks = stars // rng.randint(2, 10)
+        issues = rng.randrange(50)
+        repo = dict(_TEMPLATE)
+        repo.update({
+            "id": self._org_id * 1000 + index,
+            "node_id": "R_{}_{}".format(self._org_id, index),
+            "name": name,
+            "full_name": full_name,
+            "owner": self._owner,
+            "html_url": "https://github.com/" + full_name,
+            "description": " ".join(
+                rng.choice(_WORDS) for _ in range(self.description_size)
+            )[:self.description_size],
+            "fork": rng.random() < 0.1,
+            "created_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "updated_at": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "pushed_at": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "git_url": "git://github.com/{}.git".format(full_name),
+            "ssh_url": "git@github.com:{}.git".format(full_name),
+            "clone_url": "https://github.com/{}.git".format(full_name),
+            "svn_url": "https://github.com/" + full_name,
+            "size": rng.randrange(100000),
+            "stargazers_count": stars,
+            "watchers_count": stars,
+            "watchers": stars,
+            "forks_count": forks,
+            "forks": forks,
+            "open_issues_count": issues,
+            "open_issues": issues,
+            "language": rng.choice(_LANGUAGES),
+            "archived": rng.random() < 0.05,
+            "license": None,
+        })
+        for key, (prefix, suffix) in _REPO_URLS:
+            repo[key] = "{}/{}{}".format(prefix, full_name, suffix)
+        if license_key is not None:
+            long_name, spdx_id = _LICENSE_NAMES.get(
+                license_key, (license_key, license_key.upper()))
+            repo["license"] = {
+                "key": license_key,
+                "name": long_name,
+                "spdx_id": spdx_id,
+                "url": "{}/licenses/{}".format(self._base_url, license_key),
+                "node_id": "L_" + license_key,
+            }
+        if self.topics:
+            repo["topics"] = [rng.choice(_WORDS) + str(rng.randrange(100))
+                              for _ in range(self.topics)]
+        return repo
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repos", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--org", default="synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--description-size", type=int, default=60)
+    parser.add_argument("--topics", type=int, default=0)
+    args = parser.parse_args()
+    org = SyntheticOrg(args.org, args.repos, seed=args.seed,
+                       description_size=args.description_size,
+                       topics=args.topics)
+    print(org.write(args.path), "bytes written to", args.path)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+'''Unittests for async_client file'''
+import asyncio
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from parameterized import parameterized, parameterized_class
+
+from async_client import (AsyncGithubOrgClient, aiohttp,
+                          async_get_json_page, gather_public_repos)
+from fixtures import TEST_PAYLOAD
+from ratelimit import RateLimitScheduler
+from stub_server import StubGithubServer
+
+_, REPOS_PAYLOAD, _, APACHE2_REPOS = TEST_PAYLOAD[0]
+
+
+@parameterized_class(("org_payload", "repos_payload",
+                      "expected_repos", "apache2_repos"),
+                     TEST_PAYLOAD
+                     )
+class TestAsyncGithubOrgClient(TestCase):
+    """test AsyncGithubOrgClient against the fixtures."""
+
+    def setUp(self):
+        """serve the fixtures from a fake async_get_json_page."""
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+        async def fake_get_json_page(url, session=None, executor=None):
+            self.calls.append(url)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await asyncio.sleep(0)
+            self.in_flight -= 1
+            repos_url = self.org_payload["repos_url"]
+            if url == repos_url:
+                return self.repos_payload[:5], repos_url + "?page=2"
+            if url == repos_url + "?page=2":
+                return self.repos_payload[5:], None
+            return self.org_payload, None
+
+        patcher = patch('async_client.async_get_json_page',
+                        fake_get_json_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_public_repos(self):
+        """test that results match the sync client."""
+        client = AsyncGithubOrgClient('google')
+
+        async def run():
+            return (await client.public_repos(),
+                    await client.public_repos("apache-2.0"))
+
+        repos, apache2 = asyncio.run(run())
+        self.assertListEqual(repos, self.expected_repos)
+        self.assertListEqual(apache2, self.apache2_repos)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_single_flight(self):
+        """test that concurrent callers share one request per value."""
+        client = AsyncGithubOrgClient('google')
+
+        async def run():
+            return await asyncio.gather(
+                *(client.public_repos() for _ in range(10)))
+
+        for repos in asyncio.run(run()):
+            self.assertListEqual(repos, self.expected_repos)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_gather_bounded(self):
+        """test that gather_public_repos respects the limit."""
+        orgs = ["org{}".format(i) for i in range(50)] + ["org0"]
+        results = asyncio.run(gather_public_repos(orgs, "apache-2.0",
+                                                  limit=5))
+        self.assertEqual(list(results), orgs[:50])
+        for repos in results.values():
+            self.assertListEqual(repos, self.apache2_repos)
+        self.assertLessEqual(self.peak, 5)
+        self.assertEqual(len(self.calls), 150)
+
+
+class TestAsyncClientAgainstStubServer(TestCase):
+    """test the async client end to end, over aiohttp and threads."""
+
+    def setUp(self):
+        """serve the fixtures three repos per page."""
+        self.server = StubGithubServer(page_size=3).start()
+        self.addCleanup(self.server.stop)
+        patcher = patch.object(AsyncGithubOrgClient, "ORG_URL",
+                               self.server.org_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_with(self, use_aiohttp: bool, coroutine_function):
+        """run coroutine_function(session) with or without aiohttp."""
+        if use_aiohttp and aiohttp is None:
+            self.skipTest("aiohttp is not installed")
+
+        async def run():
+            if not use_aiohttp:
+                return await coroutine_function(None)
+            async with aiohttp.ClientSession() as session:
+                return await coroutine_function(session)
+
+        return asyncio.run(run())
+
+    @parameterized.expand([("aiohttp", True), ("threads", False)])
+    def test_pages_follow_links(self, _, use_aiohttp: bool):
+        """test that async_get_json_page follows Link rel=next."""
+        async def pages(session):
+            result = []
+            url = self.server.org_url.format(org="google") + "/repos"
+            while url:
+                page, url = await async_get_json_page(url, session)
+                result.append(page)
+            return result
+
+        pages = self.run_with(use_aiohttp, pages)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3])
+        self.assertEqual(sum(pages, []), REPOS_PAYLOAD)
+
+    @parameterized.expand([("aiohttp", True), ("threads", False)])
+    def test_scheduler_applies(self, _, use_aiohttp: bool):
+        """test that the rate-limit scheduler learns from responses."""
+        async def org(session):
+            return await AsyncGithubOrgClient("google", session).org()
+
+        with RateLimitScheduler() as scheduler:
+            self.assertEqual(self.run_with(use_aiohttp, org)["repos_url"],
+                             self.server.org_url.format(org="google") +
+                             "/repos")
+        self.assertEqual(scheduler.stats()["remaining"], 4999)
+
+    @parameterized.expand([("aiohttp", True), ("threads", False)])
+    def test_gather_collects_errors(self, _, use_aiohttp: bool):
+        """test that a failing org does not abort the others."""
+        if use_aiohttp and aiohttp is None:
+            self.skipTest("aiohttp is not installed")
+        with patch("async_client.aiohttp", aiohttp if use_aiohttp else None):
+            results = asyncio.run(gather_public_repos(
+                ["google", "nobody"], "apache-2.0", limit=4))
+        self.assertEqual(list(results), ["google", "nobody"])
+        self.assertListEqual(results["google"], APACHE2_REPOS)
+        self.assertIsInstance(results["nobody"], KeyError)
+        self.assertEqual(self.server.stats()["not_found"], 1)
+
+
+if __name__ == "__main__":
+    main()
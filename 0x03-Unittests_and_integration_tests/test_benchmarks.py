@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+'''Unittests for benchmarks file'''
+from unittest import TestCase, main
+
+from benchmarks import compare, run_suite
+
+
+def _suite(**values):
+    """a results document with the given values."""
+    units = {"get_json_throughput[10]": "MB/s"}
+    return {"results": {name: {"value": value,
+                               "unit": units.get(name, "ns/record")}
+                        for name, value in values.items()}}
+
+
+class TestBenchmarks(TestCase):
+    """test the benchmark suite and baseline comparison."""
+
+    def test_run_suite(self):
+        """test that every benchmark reports for every size."""
+        suite = run_suite(sizes=(10,), repeat=1)
+        self.assertEqual(suite["meta"]["sizes"], [10])
+        for name in ("memoize_timed", "has_license[10]", "public_repos[10]",
+                     "public_repos_license[10]", "access_nested_map[10]",
+                     "get_json[10]", "get_json_throughput[10]"):
+            self.assertGreater(suite["results"][name]["value"], 0, name)
+        self.assertEqual(suite["results"]["get_json_throughput[10]"]["unit"],
+                         "MB/s")
+
+    def test_compare(self):
+        """test that only results worse than tolerance are reported."""
+        baseline = _suite(**{"has_license[10]": 100,
+                             "public_repos[10]": 100,
+                             "get_json_throughput[10]": 100})
+        current = _suite(**{"has_license[10]": 150,
+                            "public_repos[10]": 110,
+                            "get_json_throughput[10]": 50,
+                            "new[10]": 1})
+        regressions = compare(current, baseline, tolerance=0.2)
+        self.assertEqual([r["name"] for r in regressions],
+                         ["has_license[10]", "get_json_throughput[10]"])
+        self.assertAlmostEqual(regressions[0]["change"], 0.5)
+        self.assertEqual(compare(baseline, baseline), [])
+
+
+if __name__ == "__main__":
+    main()
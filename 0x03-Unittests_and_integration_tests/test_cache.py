@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''Unittests for cache file'''
+import json
+import os
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+
+from cache import ResponseCache, current_cache
+from utils import get_json
+
+
+def _response(status: int, payload=None, etag: str = None) -> Mock:
+    """build a fake requests.Response."""
+    response = Mock()
+    response.status_code = status
+    response.headers = {"ETag": etag} if etag else {}
+    response.links = {}
+    response.content = json.dumps(payload).encode()
+    response.json.return_value = payload
+    return response
+
+
+class TestResponseCache(TestCase):
+    """test the conditional-request cache."""
+
+    def test_not_modified_served_from_cache(self):
+        """test that a 304 returns the stored document."""
+        send = Mock(side_effect=[_response(200, {"v": 1}, '"a"'),
+                                 _response(304)])
+        cache = ResponseCache()
+        self.assertEqual(cache.fetch("u", send), {"v": 1})
+        self.assertEqual(cache.fetch("u", send), {"v": 1})
+        send.assert_called_with("u", {"If-None-Match": '"a"'})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"],
+                          stats["revalidations"]), (1, 1, 1))
+
+    def test_changed_document_replaces_entry(self):
+        """test that a 200 on revalidation refreshes the entry."""
+        send = Mock(side_effect=[_response(200, {"v": 1}, '"a"'),
+                                 _response(200, {"v": 2}, '"b"'),
+                                 _response(304)])
+        cache = ResponseCache()
+        cache.fetch("u", send)
+        self.assertEqual(cache.fetch("u", send), {"v": 2})
+        self.assertEqual(cache.fetch("u", send), {"v": 2})
+        send.assert_called_with("u", {"If-None-Match": '"b"'})
+
+    def test_without_validators_nothing_is_stored(self):
+        """test that responses without validators are not cached."""
+        send = Mock(return_value=_response(200, {"v": 1}))
+        cache = ResponseCache()
+        cache.fetch("u", send)
+        cache.fetch("u", send)
+        send.assert_called_with("u", {})
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_size_bound_evicts_least_recent(self):
+        """test that max_entries is enforced."""
+        cache = ResponseCache(max_entries=2)
+        for url in ("a", "b", "c"):
+            cache.fetch(url, Mock(return_value=_response(200, [url], 'e')))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+
+    def test_persistent_across_instances(self):
+        """test that a file-backed cache survives a restart."""
+        path = os.path.join(tempfile.mkdtemp(), "cache.sqlite")
+        cache = ResponseCache(path)
+        cache.fetch("u", Mock(return_value=_response(200, {"v": 1}, 'e')))
+        cache.close()
+        cache = ResponseCache(path)
+        self.assertEqual(cache.fetch("u", Mock(return_value=_response(304))),
+                         {"v": 1})
+        cache.close()
+
+    def test_entry_evicted_before_load(self):
+        """test that an entry gone after the lookup is a miss."""
+        cache = ResponseCache()
+
+        def send(url, headers):
+            if headers:
+                cache.invalidate(url)
+                return _response(304)
+            return _response(200, {"v": 2}, '"b"')
+
+        cache.fetch("u", Mock(return_value=_response(200, {"v": 1}, '"a"')))
+        self.assertEqual(cache.fetch("u", send), {"v": 2})
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_next_link_is_kept(self):
+        """test that the next page URL survives a 304."""
+        first = _response(200, [1], 'e')
+        first.links = {"next": {"url": "u?page=2"}}
+        send = Mock(side_effect=[first, _response(304)])
+        cache = ResponseCache()
+        self.assertEqual(cache.fetch_page("u", send), ([1], "u?page=2"))
+        self.assertEqual(cache.fetch_page("u", send), ([1], "u?page=2"))
+
+    @patch('requests.get')
+    def test_get_json_uses_active_cache(self, mock_get):
+        """test that get_json goes through the active cache."""
+        mock_get.side_effect = [_response(200, {"v": 1}, 'e'),
+                                _response(304)]
+        with ResponseCache() as cache:
+            self.assertIs(current_cache(), cache)
+            self.assertEqual(get_json("http://x"), {"v": 1})
+            self.assertEqual(get_json("http://x"), {"v": 1})
+            mock_get.assert_called_with("http://x",
+                                        headers={"If-None-Match": "e"})
+        self.assertIsNone(current_cache())
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,10 @@ from parameterized import parameterized, parameterized_class
 from unittest import TestCase, main
 from unittest.mock import Mock, patch, PropertyMock
 from client import GithubOrgClient
-from utils import get_json
+from utils import extract_path, get_json
 from typing import (Callable, Dict)
 from fixtures import TEST_PAYLOAD
+import json
 import requests
 
 
@@ -54,17 +55,16 @@ class TestGithubOrgClient(TestCase):
             inst = GithubOrgClient('google')
             self.assertEqual("mock.github.com/repos", inst._public_repos_url)
 
-    @patch("client.get_json")
-    def test_public_repos(self, mock_get_json: Callable):
+    @patch("client.iter_json_pages")
+    def test_public_repos(self, mock_pages: Callable):
         """Test that the list of repos is what's expected.
             by testing public_repos method.
         """
-        mock_get_json.return_value = [{'id': 193671, 'name': 'truth',
-                                      'url':
-                                          "api.github.com/repos/test/truth"},
-                                      {'id': 123, 'name': 'lie',
-                                      'url':
-                                          "api.github.com/repos/test/lie"}]
+        mock_pages.return_value = iter([[
+            {'id': 193671, 'name': 'truth',
+             'url': "api.github.com/repos/test/truth"},
+            {'id': 123, 'name': 'lie',
+             'url': "api.github.com/repos/test/lie"}]])
 
         with patch.object(GithubOrgClient, '_public_repos_url',
                           new_callable=PropertyMock) as mock_repo_url:
@@ -74,7 +74,69 @@ class TestGithubOrgClient(TestCase):
 
             self.assertListEqual(["truth", "lie"], inst.public_repos())
             mock_repo_url.assert_called_once()
-            mock_get_json.assert_called_once()
+            mock_pages.assert_called_once()
+
+    @patch("client.iter_json_pages")
+    def test_iter_public_repos(self, mock_pages: Callable):
+        """Test that iter_public_repos streams the filtered names
+            page by page with prefetching.
+        """
+        mock_pages.return_value = iter([
+            [{"name": "a", "license": {"key": "mit"}}, {"name": "b"}],
+            [{"name": "c", "license": {"key": "mit"}}]])
+
+        with patch.object(GithubOrgClient, '_public_repos_url',
+                          new_callable=PropertyMock) as mock_repo_url:
+            mock_repo_url.return_value = "api.github.com/orgs/test/repos"
+            inst = GithubOrgClient('google')
+
+            self.assertListEqual(list(inst.iter_public_repos("mit")),
+                                 ["a", "c"])
+            mock_pages.assert_called_once_with(
+                "api.github.com/orgs/test/repos", prefetch=True, pool=None)
+
+    @patch("client.iter_json_items")
+    def test_stream_mode(self, mock_items: Callable):
+        """Test that stream mode feeds repos one by one into the
+            projection and the lazy iterator.
+        """
+        repos = [{"name": "a", "license": {"key": "mit"}}, {"name": "b"}]
+        mock_items.side_effect = lambda *args, **kwargs: iter(repos)
+
+        with patch.object(GithubOrgClient, '_public_repos_url',
+                          new_callable=PropertyMock,
+                          return_value="api.github.com/orgs/test/repos"):
+            inst = GithubOrgClient('google', projection=True, stream=True)
+            self.assertListEqual(inst.public_repos(), ["a", "b"])
+            self.assertListEqual(inst.public_repos("mit"), ["a"])
+            self.assertListEqual(list(inst.iter_public_repos("mit")), ["a"])
+            mock_items.assert_called_with("api.github.com/orgs/test/repos",
+                                          pool=None)
+            self.assertEqual(mock_items.call_count, 2)
+
+    @patch("client.iter_json_pages")
+    def test_license_index(self, mock_pages: Callable):
+        """Test that license filters and the histogram share one index
+            built in a single pass over the memoized payload.
+        """
+        mock_pages.return_value = iter([[
+            {"name": "a", "license": {"key": "mit"}},
+            {"name": "b", "license": None},
+            {"name": "c", "license": {"key": "bsd"}},
+            {"name": "d", "license": {"key": "mit"}}]])
+
+        with patch.object(GithubOrgClient, '_public_repos_url',
+                          new_callable=PropertyMock,
+                          return_value="api.github.com/orgs/test/repos"):
+            inst = GithubOrgClient('google')
+            with patch("client.extract_path",
+                       wraps=extract_path) as mock_extract:
+                self.assertListEqual(inst.public_repos("mit"), ["a", "d"])
+                self.assertListEqual(inst.public_repos("bsd"), ["c"])
+                self.assertListEqual(inst.public_repos("gpl"), [])
+                mock_extract.assert_called_once()
+            self.assertDictEqual(inst.license_histogram(),
+                                 {"mit": 2, None: 1, "bsd": 1})
 
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
@@ -103,8 +165,12 @@ class TestIntegrationGithubOrgClient(TestCase):
         """
         cls.get_patcher = patch('requests.get')
         cls.mock_get = cls.get_patcher.start()
+        cls.mock_get.return_value.links = {}
         cls.mock_get.return_value.json.side_effect = [
             cls.org_payload, cls.repos_payload]
+        type(cls.mock_get.return_value).content = PropertyMock(side_effect=[
+            json.dumps(cls.org_payload).encode(),
+            json.dumps(cls.repos_payload).encode()])
 
     @classmethod
     def tearDownClass(cls):
@@ -139,11 +205,45 @@ class TestIntegrationGithubOrgClient(TestCase):
 
         self.mock_get.assert_called()
 
+        # the index agrees with a linear has_license scan
+        for key in client.license_histogram():
+            if key is not None:
+                self.assertListEqual(client.public_repos(key), [
+                    repo["name"] for repo in self.repos_payload
+                    if client.has_license(repo, key)])
+        self.assertEqual(sum(client.license_histogram().values()),
+                         len(self.expected_repos))
+
+    def test_public_repos_projection(self):
+        """test that the projection mode gives the same answers
+        while keeping less memory than the raw payload."""
+        self.mock_get.return_value.json.side_effect = [
+            self.org_payload, self.repos_payload]
+        type(self.mock_get.return_value).content = PropertyMock(side_effect=[
+            json.dumps(self.org_payload).encode(),
+            json.dumps(self.repos_payload).encode()])
+        client = GithubOrgClient('blablabla', projection=True)
+
+        self.assertIsNone(client.projection_report())
+        self.assertListEqual(client.public_repos(), self.expected_repos)
+        self.assertListEqual(client.public_repos("apache-2.0"),
+                             self.apache2_repos)
+        self.assertNotIn("_repos_payload", client.__dict__)
+
+        report = client.projection_report()
+        self.assertEqual(report["repos"], len(self.expected_repos))
+        self.assertGreater(report["saved_bytes"], 0)
+        self.assertEqual(report["full_bytes"] - report["projected_bytes"],
+                         report["saved_bytes"])
+
     def test_public_repos_with_license(self):
         """test the public_repos with the argument
         """
         self.mock_get.return_value.json.side_effect = [
             self.org_payload, self.repos_payload]
+        type(self.mock_get.return_value).content = PropertyMock(side_effect=[
+            json.dumps(self.org_payload).encode(),
+            json.dumps(self.repos_payload).encode()])
         client = GithubOrgClient('blablabla')
         # Check org payload
         self.assertEqual(client.org, self.org_payload)
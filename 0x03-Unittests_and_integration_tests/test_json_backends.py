@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+'''Unittests for json_backends file'''
+import json
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+
+import requests
+
+from json_backends import (_backends, available_backends, current_backend,
+                           decode_response, get_backend, register_backend,
+                           use_backend)
+from utils import get_json
+
+
+class TestJSONBackends(TestCase):
+    """test the pluggable JSON decoders."""
+
+    def test_stdlib_is_always_available(self):
+        """test that the stdlib fallback is always installed."""
+        self.assertIn("json", available_backends())
+        self.assertEqual(get_backend("json").loads(b'{"a": 1}'), {"a": 1})
+
+    def test_every_backend_agrees(self):
+        """test that every installed backend decodes alike."""
+        raw = json.dumps({"a": [1, 2.5, None, "é"]}).encode()
+        for name in available_backends():
+            self.assertEqual(get_backend(name).loads(raw),
+                             {"a": [1, 2.5, None, "é"]}, name)
+
+    def test_unknown_backend(self):
+        """test that an unknown name raises ValueError."""
+        with self.assertRaises(ValueError):
+            get_backend("no-such-parser")
+
+    @patch('requests.get')
+    def test_get_json_uses_current_backend(self, mock_get):
+        """test that get_json decodes with the backend in use."""
+        register_backend("fake", Mock(return_value={"fake": True}))
+        self.addCleanup(_backends.pop, "fake")
+        response = requests.Response()
+        response._content = b'{}'
+        mock_get.return_value = response
+        with use_backend("fake") as backend:
+            self.assertIs(current_backend(), backend)
+            self.assertEqual(get_json("http://x"), {"fake": True})
+        backend.loads.assert_called_once_with(b'{}')
+        self.assertIsNot(current_backend(), backend)
+
+    def test_decode_response_reads_the_body(self):
+        """test that every backend decodes the body, not json()."""
+        response = Mock(content=b'{"body": true}')
+        for name in available_backends():
+            with use_backend(name):
+                self.assertEqual(decode_response(response), {"body": True})
+        response.json.assert_not_called()
+
+
+if __name__ == "__main__":
+    main()
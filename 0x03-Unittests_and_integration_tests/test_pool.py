@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+'''Unittests for pool file'''
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from client import GithubOrgClient
+from pool import SessionPool, current_pool
+from utils import get_json
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    """serve a small JSON document over keep-alive connections."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """answer every GET with the requested path as JSON."""
+        if self.path.endswith("/repos"):
+            body = json.dumps([{"name": "truth"}]).encode()
+        else:
+            body = json.dumps({"path": self.path,
+                               "repos_url": self.server.url + "/repos"
+                               }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """keep the test output quiet."""
+
+
+class TestSessionPool(TestCase):
+    """test that SessionPool reuses connections and reports it."""
+
+    @classmethod
+    def setUpClass(cls):
+        """start a local keep-alive server once for all tests."""
+        cls.server = HTTPServer(("127.0.0.1", 0), _JSONHandler)
+        cls.server.url = "http://127.0.0.1:{}".format(cls.server.server_port)
+        cls.thread = threading.Thread(target=cls.server.serve_forever,
+                                      daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """stop the local server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_context_activates_pool(self):
+        """test that entering the pool makes it the active one."""
+        self.assertIsNone(current_pool())
+        with SessionPool() as pool:
+            self.assertIs(current_pool(), pool)
+            self.assertFalse(pool.closed)
+        self.assertIsNone(current_pool())
+        self.assertTrue(pool.closed)
+
+    def test_get_json_reuses_connection(self):
+        """test that get_json calls share one keep-alive connection."""
+        with SessionPool(host_pool_sizes={"127.0.0.1": 2}) as pool:
+            for _ in range(5):
+                data = get_json(self.server.url + "/orgs/google")
+                self.assertEqual(data["path"], "/orgs/google")
+        self.assertEqual(pool.stats()["127.0.0.1"],
+                         {"requests": 5, "connections": 1, "reused": 4})
+
+    @patch('requests.get')
+    def test_get_json_without_pool(self, mock_get):
+        """test that get_json falls back to requests.get."""
+        mock_get.return_value.json.return_value = {"payload": True}
+        mock_get.return_value.content = b'{"payload": true}'
+        self.assertEqual(get_json("http://example.com"), {"payload": True})
+        mock_get.assert_called_once_with("http://example.com")
+
+    def test_client_bound_pool(self):
+        """test that GithubOrgClient sends its requests through its pool."""
+        pool = SessionPool().open()
+        try:
+            client = GithubOrgClient("google", pool=pool)
+            client.ORG_URL = self.server.url + "/orgs/{org}"
+            self.assertEqual(client.public_repos(), ["truth"])
+            self.assertIsNone(current_pool())
+            self.assertEqual(pool.stats()["127.0.0.1"]["requests"], 2)
+        finally:
+            pool.close()
+
+    def test_closed_pool_raises(self):
+        """test that a closed pool refuses requests."""
+        with self.assertRaises(RuntimeError):
+            SessionPool().get(self.server.url)
+
+
+if __name__ == "__main__":
+    main()
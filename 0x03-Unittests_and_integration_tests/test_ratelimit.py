@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+'''Unittests for ratelimit file'''
+import asyncio
+import time
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+
+from ratelimit import (RateLimitExceeded, RateLimitScheduler,
+                       current_scheduler, rate_limited)
+from utils import get_json
+
+
+class FakeClock:
+    """a clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimitScheduler(TestCase):
+    """test the token bucket scheduler."""
+
+    def setUp(self):
+        """use a fake clock for every scheduler."""
+        self.clock = FakeClock()
+
+    def scheduler(self, **kwargs) -> RateLimitScheduler:
+        """build a scheduler on the fake clock."""
+        return RateLimitScheduler(clock=self.clock, sleep=self.clock.sleep,
+                                  **kwargs)
+
+    def test_burst_then_pace(self):
+        """test that requests beyond the burst are paced at rate."""
+        scheduler = self.scheduler(rate=2, burst=3)
+        delays = [scheduler.acquire() for _ in range(5)]
+        self.assertEqual(delays, [0, 0, 0, 0.5, 0.5])
+        stats = scheduler.stats()
+        self.assertEqual((stats["waits"], stats["queue_depth"]), (2, 0))
+        self.assertAlmostEqual(stats["wait_seconds"], 1.0)
+
+    def test_headers_set_the_pace(self):
+        """test that the remaining quota is spread until the reset."""
+        scheduler = self.scheduler(rate=100, burst=1)
+        scheduler.update({"X-RateLimit-Remaining": "10",
+                          "X-RateLimit-Reset": str(time.time() + 100)})
+        scheduler.acquire()
+        self.assertAlmostEqual(scheduler.acquire(), 10, delta=0.5)
+        self.assertEqual(scheduler.stats()["remaining"], 10)
+
+    def test_exhausted_quota_pauses(self):
+        """test that a zero remaining quota waits for the reset."""
+        scheduler = self.scheduler()
+        scheduler.update({"X-RateLimit-Remaining": "0",
+                          "X-RateLimit-Reset": str(time.time() + 60)})
+        self.assertAlmostEqual(scheduler.stats()["paused_for"], 60,
+                               delta=0.5)
+        self.assertAlmostEqual(scheduler.acquire(), 60, delta=0.5)
+
+    def test_secondary_rate_limit(self):
+        """test that Retry-After on a 403 pauses every caller."""
+        scheduler = self.scheduler()
+        scheduler.update({"Retry-After": "30"}, status=403)
+        self.assertEqual(scheduler.acquire(), 30)
+        scheduler.update({"Retry-After": "30"}, status=200)
+        self.assertEqual(scheduler.acquire(), 0)
+
+    def test_secondary_rate_limit_without_headers(self):
+        """test that a header-less secondary limit backs off."""
+        scheduler = self.scheduler(backoff=10)
+        self.assertEqual(scheduler.update({}, 403, limited=True), 10)
+        self.assertEqual(scheduler.acquire(), 10)
+        self.assertEqual(scheduler.update({}, 403, limited=True), 20)
+        self.assertEqual(scheduler.update({}, 200), 0)
+        self.assertEqual(scheduler.acquire(), 20)
+        self.assertEqual(scheduler.update({}, 403, limited=True), 10)
+
+    def test_malformed_headers_are_ignored(self):
+        """test that unparsable headers do not raise."""
+        scheduler = self.scheduler(backoff=5)
+        scheduler.update({"X-RateLimit-Remaining": "lots",
+                          "X-RateLimit-Reset": "soon"})
+        self.assertIsNone(scheduler.stats()["remaining"])
+        self.assertEqual(scheduler.update({"Retry-After": "later"}, 429), 5)
+        self.assertEqual(scheduler.acquire(), 5)
+        self.assertGreater(scheduler.update(
+            {"Retry-After": "Wed, 21 Oct 2099 07:28:00 GMT"}, 429), 0)
+
+    def test_rate_limited(self):
+        """test which responses count as rate limited."""
+        self.assertTrue(rate_limited(429, {}))
+        self.assertTrue(rate_limited(403, {"Retry-After": "1"}))
+        self.assertTrue(rate_limited(403, {"X-RateLimit-Remaining": "0"}))
+        self.assertTrue(rate_limited(
+            403, {}, "You have exceeded a secondary rate limit"))
+        self.assertFalse(rate_limited(403, {}, "Resource not accessible"))
+        self.assertFalse(rate_limited(200, {"Retry-After": "1"}))
+
+    def test_acquire_async(self):
+        """test that coroutines are paced without blocking."""
+        scheduler = RateLimitScheduler(rate=100, burst=1)
+
+        async def run():
+            return await asyncio.gather(
+                *(scheduler.acquire_async() for _ in range(3)))
+
+        for delay, expected in zip(asyncio.run(run()), [0, 0.01, 0.02]):
+            self.assertAlmostEqual(delay, expected, delta=0.005)
+
+    @patch('requests.get')
+    def test_get_json_is_scheduled(self, mock_get):
+        """test that get_json acquires and updates the scheduler."""
+        mock_get.return_value = Mock(status_code=200, headers={
+            "X-RateLimit-Remaining": "42",
+            "X-RateLimit-Reset": str(time.time() + 60)})
+        mock_get.return_value.json.return_value = {}
+        mock_get.return_value.content = b'{}'
+        with self.scheduler() as scheduler:
+            self.assertIs(current_scheduler(), scheduler)
+            get_json("http://x")
+        self.assertIsNone(current_scheduler())
+        self.assertEqual(scheduler.stats()["remaining"], 42)
+
+    @patch('requests.get')
+    def test_get_json_resends_after_the_pause(self, mock_get):
+        """test that a rate-limited request is sent again."""
+        limited = Mock(status_code=429, headers={"Retry-After": "30"})
+        ok = Mock(status_code=200, headers={})
+        ok.json.return_value = {"ok": True}
+        ok.content = b'{"ok": true}'
+        mock_get.side_effect = [limited, ok]
+        with self.scheduler():
+            self.assertEqual(get_json("http://x"), {"ok": True})
+        self.assertEqual(self.clock.slept, [30])
+
+    @patch('requests.get')
+    def test_get_json_gives_up(self, mock_get):
+        """test that RateLimitExceeded ends an exhausted wait budget."""
+        limited = Mock(status_code=403, headers={}, text="secondary "
+                       "rate limit")
+        mock_get.return_value = limited
+        with self.scheduler(backoff=60, max_wait=200):
+            with self.assertRaises(RateLimitExceeded) as error:
+                get_json("http://x")
+        self.assertEqual(self.clock.slept, [60, 120])
+        self.assertEqual(error.exception.retry_after, 240)
+        self.assertIs(error.exception.response, limited)
+
+
+if __name__ == "__main__":
+    main()
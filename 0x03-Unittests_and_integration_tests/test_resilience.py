@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+'''Unittests for resilience file'''
+import json
+import random
+import threading
+from unittest import TestCase, main
+from unittest.mock import Mock, patch
+
+import requests
+from parameterized import parameterized
+
+from resilience import (CircuitBreaker, CircuitOpenError, Resilience,
+                        hedged)
+from utils import get_json
+
+
+def _response(status: int) -> Mock:
+    """build a fake requests.Response."""
+    response = Mock(status_code=status, headers={})
+    response.json.return_value = {"status": status}
+    response.content = json.dumps({"status": status}).encode()
+    return response
+
+
+class TestResilience(TestCase):
+    """test retries, circuit breakers and hedging."""
+
+    def setUp(self):
+        """record the sleeps instead of sleeping."""
+        self.sleeps = []
+
+    def resilience(self, **kwargs) -> Resilience:
+        """build a layer that does not really sleep."""
+        return Resilience(sleep=self.sleeps.append, rng=random.Random(0),
+                          **kwargs)
+
+    @parameterized.expand([
+        (requests.ConnectionError("reset"),),
+        (requests.Timeout("slow"),),
+        (_response(503),),
+    ])
+    def test_transient_failure_is_retried(self, failure):
+        """test that one transient failure does not propagate."""
+        ok = _response(200)
+        send = Mock(side_effect=[failure, ok])
+        layer = self.resilience()
+        self.assertIs(layer.call("http://h/a", send), ok)
+        stats = layer.stats()
+        self.assertEqual((stats["attempts"], stats["retries"]), (2, 1))
+        self.assertIsNotNone(stats["latency_p50"])
+
+    def test_retries_are_bounded(self):
+        """test that the last error is raised after max_attempts."""
+        send = Mock(side_effect=requests.ConnectionError("down"))
+        layer = self.resilience(max_attempts=3, failure_threshold=10)
+        with self.assertRaises(requests.ConnectionError):
+            layer.call("http://h/a", send)
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_decorrelated_jitter(self):
+        """test that sleeps stay within base and cap."""
+        send = Mock(return_value=_response(500))
+        layer = self.resilience(max_attempts=20, base_delay=0.1,
+                                max_delay=2, failure_threshold=100)
+        self.assertEqual(layer.call("http://h/a", send).status_code, 500)
+        self.assertEqual(len(self.sleeps), 19)
+        for delay in self.sleeps:
+            self.assertGreaterEqual(delay, 0.1)
+            self.assertLessEqual(delay, 2)
+        self.assertGreater(len(set(self.sleeps)), 1)
+
+    def test_circuit_breaker(self):
+        """test that the circuit opens, then lets one trial through."""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                 clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        now[0] = 11
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_open_circuit_fails_fast(self):
+        """test that an open circuit short-circuits per host."""
+        layer = self.resilience(max_attempts=1, failure_threshold=1)
+        down = Mock(side_effect=requests.ConnectionError("down"))
+        with self.assertRaises(requests.ConnectionError):
+            layer.call("http://down/a", down)
+        with self.assertRaises(CircuitOpenError):
+            layer.call("http://down/b", down)
+        self.assertEqual(down.call_count, 1)
+        ok = _response(200)
+        self.assertIs(layer.call("http://up/a", Mock(return_value=ok)), ok)
+        self.assertEqual(layer.stats()["short_circuited"], 1)
+
+    def test_failed_trial_reopens_circuit(self):
+        """test that a trial raising a request error is a failure."""
+        now = [0.0]
+        layer = self.resilience(max_attempts=1, failure_threshold=1,
+                                reset_timeout=10)
+        breaker = layer.breaker("http://h/a")
+        breaker._clock = lambda: now[0]
+        with self.assertRaises(requests.ConnectionError):
+            layer.call("http://h/a", Mock(
+                side_effect=requests.ConnectionError("down")))
+        now[0] = 11
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            layer.call("http://h/a", Mock(
+                side_effect=requests.exceptions.ChunkedEncodingError()))
+        self.assertEqual(breaker.state, "open")
+        now[0] = 22
+        ok = _response(200)
+        self.assertIs(layer.call("http://h/a", Mock(return_value=ok)), ok)
+        self.assertEqual(breaker.state, "closed")
+
+    @parameterized.expand([(TypeError,), (KeyboardInterrupt,)])
+    def test_other_errors_release_the_trial(self, error):
+        """test that a non-request error only frees the trial."""
+        now = [0.0]
+        layer = self.resilience(max_attempts=1, failure_threshold=1,
+                                reset_timeout=10)
+        breaker = layer.breaker("http://h/a")
+        breaker._clock = lambda: now[0]
+        with self.assertRaises(error):
+            layer.call("http://h/a", Mock(side_effect=error()))
+        self.assertEqual(breaker.state, "closed")
+        with self.assertRaises(requests.ConnectionError):
+            layer.call("http://h/a", Mock(
+                side_effect=requests.ConnectionError("down")))
+        now[0] = 11
+        with self.assertRaises(error):
+            layer.call("http://h/a", Mock(side_effect=error()))
+        self.assertEqual(breaker.state, "half_open")
+        self.assertEqual(layer.stats()["failures"], 1)
+        ok = _response(200)
+        self.assertIs(layer.call("http://h/a", Mock(return_value=ok)), ok)
+        self.assertEqual(breaker.state, "closed")
+
+    @staticmethod
+    def _slow_then_fast(release: threading.Event, slow, fast):
+        """send() whose first call waits for release."""
+        def send():
+            if not hasattr(send, "called"):
+                send.called = True
+                release.wait(5)
+                return slow
+            return fast
+        return send
+
+    def test_hedged_request(self):
+        """test that a slow first attempt is raced by a second one."""
+        release = threading.Event()
+        slow, fast = _response(200), _response(200)
+        send = self._slow_then_fast(release, slow, fast)
+
+        with self.resilience(hedge_after=0.01) as layer:
+            self.assertIs(layer.call("http://h/a", send, hedge=True), fast)
+            release.set()
+        stats = layer.stats()
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 1))
+
+    def test_hedging_is_opt_in(self):
+        """test that only opted-in requests are hedged."""
+        release = threading.Event()
+        release.set()
+        slow, fast = _response(200), _response(200)
+        with self.resilience(hedge_after=0.01) as layer:
+            send = self._slow_then_fast(release, slow, fast)
+            self.assertIs(layer.call("http://h/a", send), slow)
+            self.assertEqual(layer.stats()["hedges"], 0)
+            release.clear()
+            send = self._slow_then_fast(release, slow, fast)
+            with hedged():
+                self.assertIs(layer.call("http://h/a", send), fast)
+            release.set()
+        self.assertEqual(layer.stats()["hedges"], 1)
+
+    @patch('requests.get')
+    def test_get_json_is_retried(self, mock_get):
+        """test that get_json goes through the active layer."""
+        mock_get.side_effect = [requests.ConnectionError("reset"),
+                                _response(200)]
+        with self.resilience():
+            self.assertEqual(get_json("http://x"), {"status": 200})
+        self.assertEqual(mock_get.call_count, 2)
+
+
+if __name__ == "__main__":
+    main()
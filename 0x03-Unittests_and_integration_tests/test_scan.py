@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''Unittests for scan file'''
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from fixtures import TEST_PAYLOAD
+from scan import scan_orgs
+
+ORG_PAYLOAD, REPOS_PAYLOAD, EXPECTED_REPOS, APACHE2_REPOS = TEST_PAYLOAD[0]
+
+
+def _fake_get_json(url: str):
+    """serve the org fixture, failing for the 'broken' org."""
+    if url.endswith("/broken"):
+        raise ConnectionError("boom")
+    return ORG_PAYLOAD
+
+
+class TestScanOrgs(TestCase):
+    """test the batch scanner."""
+
+    def setUp(self):
+        """serve the fixtures instead of the network."""
+        self.get_json = patch('client.get_json',
+                              side_effect=_fake_get_json).start()
+        self.pages = patch('client.iter_json_pages',
+                           side_effect=lambda *a, **k: iter([REPOS_PAYLOAD])
+                           ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_scan_orgs(self):
+        """test that each distinct org is scanned once."""
+        orgs = ["google", "abc", "Google", "abc", "xyz"]
+        results = list(scan_orgs(orgs, "apache-2.0", workers=3))
+
+        self.assertEqual(sorted(r.org for r in results),
+                         ["abc", "google", "xyz"])
+        for result in results:
+            self.assertListEqual(result.repos, APACHE2_REPOS)
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.elapsed, 0)
+        self.assertEqual([r.completed for r in results], [1, 2, 3])
+        self.assertGreater(results[-1].orgs_per_second, 0)
+        self.assertEqual(self.get_json.call_count, 3)
+
+    def test_same_url_is_fetched_once(self):
+        """test that org names resolving to the same URL are merged."""
+        results = list(scan_orgs(["a b", "A%20B", "a%20b"]))
+
+        self.assertEqual([r.org for r in results], ["a b"])
+        self.assertEqual(self.get_json.call_count, 1)
+
+    def test_orgs_are_consumed_lazily(self):
+        """test that only a window of orgs is submitted ahead."""
+        pulled = []
+
+        def orgs():
+            for i in range(100):
+                pulled.append(i)
+                yield "org{}".format(i)
+
+        scan = scan_orgs(orgs(), workers=2)
+        next(scan)
+        self.assertLessEqual(len(pulled), 2 * 2 + 1)
+        self.assertEqual(len(list(scan)), 99)
+        self.assertEqual(len(pulled), 100)
+
+    def test_scan_orgs_reports_errors(self):
+        """test that a failing org does not abort the batch."""
+        results = {r.org: r for r in scan_orgs(["broken", "google"])}
+
+        self.assertIsNone(results["broken"].repos)
+        self.assertIsInstance(results["broken"].error, ConnectionError)
+        self.assertListEqual(results["google"].repos, EXPECTED_REPOS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+'''Unittests for store file'''
+import os
+import tempfile
+from unittest import TestCase, main
+
+from client import GithubOrgClient
+from pool import SessionPool
+from fixtures import TEST_PAYLOAD
+from store import SnapshotStore
+from stub_server import StubGithubServer
+from synthetic import SyntheticOrg
+
+
+class TestSnapshotStore(TestCase):
+    """test the on-disk snapshot store."""
+
+    def setUp(self):
+        """serve the fixtures and a synthetic org; store to a file."""
+        self.server = StubGithubServer(page_size=50).start()
+        self.addCleanup(self.server.stop)
+        self.repos = SyntheticOrg("acme", 500, seed=9)[:]
+        self.server.add_org("acme", self.repos)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "github.sqlite")
+
+    def test_cold_start_is_offline(self):
+        """test that a fresh store answers without the network."""
+        org_payload, _, expected_repos, apache2_repos = TEST_PAYLOAD[0]
+        with SnapshotStore(self.path) as store:
+            self.server.client("google", store=store).sync()
+        org_url = self.server.org_url
+        self.server.stop()
+        with SnapshotStore(self.path) as store:
+            self.assertEqual(store.orgs(), ["google"])
+            client = GithubOrgClient("google", store=store)
+            client.ORG_URL = org_url
+            self.assertEqual(client.public_repos(), expected_repos)
+            self.assertEqual(client.public_repos("apache-2.0"),
+                             apache2_repos)
+            self.assertEqual(client.org["repos_url"],
+                             org_url.format(org="google") + "/repos")
+
+    def test_save_writes_churn_only(self):
+        """test that an incremental sync rewrites the changed repos."""
+        with SnapshotStore(self.path) as store:
+            client = self.server.client("acme", store=store)
+            client.sync()
+            self.assertEqual(store.stats()["repos"], 500)
+            self.repos[10] = dict(self.repos[10], license=None,
+                                  updated_at="2099-01-01T00:00:00Z")
+            self.server.add_org("acme", self.repos)
+            stats = client.sync()
+            self.assertEqual((stats["pages"], stats["changed"]), (1, 1))
+            self.assertEqual(store.snapshot("acme").changes()[1][10],
+                             self.repos[10])
+        with SnapshotStore(self.path) as store:
+            names = self.server.client("acme", store=store).public_repos(
+                "mit")
+            self.assertNotIn(self.repos[10]["name"], names)
+            self.assertEqual(names, self.server.client("acme").public_repos(
+                "mit"))
+
+    def test_warm_start_syncs_incrementally(self):
+        """test that a new process resumes from the stored cursor."""
+        with SnapshotStore(self.path) as store:
+            self.server.client("acme", store=store).sync()
+        with SnapshotStore(self.path) as store:
+            before = self.server.stats()["requests"]
+            client = self.server.client("acme", store=store)
+            stats = client.sync()
+            self.assertEqual(self.server.stats()["requests"] - before, 1)
+            self.assertEqual((stats["full_syncs"], stats["pages"]), (0, 1))
+            self.assertEqual(client.public_repos(),
+                             self.server.client("acme").public_repos())
+
+    def test_sync_uses_client_pool(self):
+        """test that store syncs go through the client's pool."""
+        with SessionPool() as other, SnapshotStore() as store:
+            pool = SessionPool().open()
+            self.addCleanup(pool.close)
+            self.server.client("acme", pool=pool, store=store).sync()
+            self.assertEqual(pool.stats()["127.0.0.1"]["requests"], 1 + 10)
+            self.assertEqual(other.stats(), {})
+
+    def test_unknown_org(self):
+        """test that unknown orgs are not answered from the store."""
+        with SnapshotStore() as store:
+            self.assertIsNone(store.public_repos("nobody"))
+            self.assertIsNone(store.org_payload("nobody"))
+            self.assertIsNone(store.snapshot("nobody").cursor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+'''Unittests for stub_server file'''
+from unittest import TestCase, main
+
+import requests
+
+from cache import ResponseCache
+from fixtures import TEST_PAYLOAD
+from pool import SessionPool
+from ratelimit import RateLimitScheduler
+from resilience import Resilience
+from stub_server import StubGithubServer, measure_throughput
+from synthetic import SyntheticOrg
+
+
+class TestStubGithubServer(TestCase):
+    """test GithubOrgClient end to end against the local stub."""
+
+    def setUp(self):
+        """serve the fixtures two repos per page."""
+        self.server = StubGithubServer(page_size=2).start()
+        self.addCleanup(self.server.stop)
+
+    def test_public_repos(self):
+        """test that the fixture org is served page by page."""
+        org_payload, repos_payload, expected_repos, apache2_repos = \
+            TEST_PAYLOAD[0]
+        client = self.server.client("google")
+        self.assertEqual(client.public_repos(), expected_repos)
+        self.assertEqual(client.public_repos("apache-2.0"), apache2_repos)
+        pages = (len(repos_payload) + 1) // 2
+        self.assertEqual(self.server.stats()["requests"], 1 + pages)
+
+    def test_pagination_headers(self):
+        """test that repos pages link to the next and last ones."""
+        response = requests.get(self.server.url + "/orgs/google/repos")
+        self.assertIn("next", response.links)
+        self.assertIn("page=5", response.links["last"]["url"])
+        self.assertEqual(len(response.json()), 2)
+
+    def test_etag(self):
+        """test that If-None-Match is answered with 304."""
+        url = self.server.url + "/orgs/google"
+        etag = requests.get(url).headers["ETag"]
+        response = requests.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        with ResponseCache() as cache:
+            self.server.client("google").org
+            self.server.client("google").org
+            self.assertEqual(cache.stats()["revalidations"], 1)
+        self.assertEqual(self.server.stats()["not_modified"], 2)
+
+    def test_rate_limit(self):
+        """test that the quota counts down, then answers 403."""
+        server = StubGithubServer(rate_limit=2).start()
+        self.addCleanup(server.stop)
+        with RateLimitScheduler() as scheduler:
+            server.client("google").org
+        self.assertEqual(scheduler.stats()["remaining"], 1)
+        url = server.url + "/orgs/google"
+        self.assertEqual(requests.get(url).headers[
+            "X-RateLimit-Remaining"], "0")
+        self.assertEqual(requests.get(url).status_code, 403)
+        self.assertEqual(server.stats()["rate_limited"], 1)
+
+    def test_error_injection(self):
+        """test that injected failures are retried away."""
+        server = StubGithubServer(error_rate=0.3, seed=1).start()
+        self.addCleanup(server.stop)
+        with Resilience(base_delay=0, max_attempts=10) as resilience:
+            self.assertEqual(server.client("google").public_repos(),
+                             TEST_PAYLOAD[0][2])
+        self.assertGreater(server.stats()["errors"], 0)
+        self.assertEqual(resilience.stats()["retries"],
+                         server.stats()["errors"])
+
+    def test_unknown_org(self):
+        """test that unknown orgs are answered with 404."""
+        response = requests.get(self.server.url + "/orgs/nobody")
+        self.assertEqual(response.status_code, 404)
+
+    def test_measure_throughput(self):
+        """test that a synthetic org is fetched end to end."""
+        self.server.add_org("synthetic", SyntheticOrg(repos=50))
+        with SessionPool() as pool:
+            result = measure_throughput(self.server, ["synthetic"],
+                                        rounds=2, pool=pool)
+        self.assertEqual(result["repos"], 100)
+        self.assertEqual(result["requests"], 2 * (1 + 25))
+        self.assertGreater(result["requests_per_second"], 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+'''Unittests for sync file'''
+from unittest import TestCase, main
+
+from pool import SessionPool
+from stub_server import StubGithubServer
+from sync import RepoSnapshot
+from synthetic import SyntheticOrg
+
+
+class TestRepoSnapshot(TestCase):
+    """test incremental syncs against the local stub server."""
+
+    def setUp(self):
+        """serve 250 synthetic repos, ten per page."""
+        self.repos = SyntheticOrg("acme", 250, seed=5)[:]
+        self.clock = 0
+        self.server = StubGithubServer(page_size=10).start()
+        self.addCleanup(self.server.stop)
+        self.server.add_org("acme", self.repos)
+
+    def touch(self, index, **changes):
+        """update repo index as the newest one of the org."""
+        self.clock += 1
+        self.repos[index] = dict(
+            self.repos[index],
+            updated_at="2099-01-01T00:00:{:02d}Z".format(self.clock),
+            **changes)
+        self.server.add_org("acme", self.repos)
+
+    def expected(self, license=None):
+        """public_repos of a client without a snapshot."""
+        return self.server.client("acme").public_repos(license)
+
+    def test_first_sync_is_full(self):
+        """test that the first sync reads the whole listing."""
+        client = self.server.client("acme", snapshot=RepoSnapshot())
+        self.assertEqual(client.public_repos(), self.expected())
+        stats = client._snapshot.stats()
+        self.assertEqual((stats["full_syncs"], stats["pages"],
+                          stats["repos"]), (1, 25, 250))
+
+    def test_sync_scales_with_churn(self):
+        """test that a refresh only reads the changed repos."""
+        client = self.server.client("acme", snapshot=RepoSnapshot())
+        client.public_repos("mit")
+        self.touch(3, license=None)
+        self.touch(7, description="changed")
+        before = self.server.stats()["requests"]
+        stats = client.sync()
+        self.assertEqual(self.server.stats()["requests"] - before, 1)
+        self.assertEqual((stats["pages"], stats["changed"], stats["added"]),
+                         (1, 2, 0))
+        self.assertEqual(client.public_repos(), self.expected())
+        self.assertEqual(client.public_repos("mit"), self.expected("mit"))
+        self.assertNotIn(self.repos[3]["name"], client.public_repos("mit"))
+        self.assertEqual(client.license_histogram()[None],
+                         len(self.expected()) - sum(
+                             1 for repo in self.repos if repo["license"]))
+
+    def test_new_and_deleted_repos(self):
+        """test that new repos are merged and deleted ones need a full
+        sync."""
+        snapshot = RepoSnapshot()
+        client = self.server.client("acme", snapshot=snapshot)
+        client.public_repos()
+        gone = self.repos.pop(0)
+        self.repos.append(dict(SyntheticOrg("acme", 251, seed=5)[250]))
+        self.touch(len(self.repos) - 1)
+        stats = client.sync()
+        self.assertEqual(stats["added"], 1)
+        self.assertIn(gone["name"], client.public_repos())
+        stats = client.sync(full=True)
+        self.assertEqual((stats["removed"], stats["full_syncs"]), (1, 2))
+        self.assertEqual(client.public_repos(), self.expected())
+
+    def test_sync_uses_client_pool(self):
+        """test that snapshot syncs go through the client's pool."""
+        pool = SessionPool().open()
+        self.addCleanup(pool.close)
+        client = self.server.client("acme", pool=pool,
+                                    snapshot=RepoSnapshot())
+        client.public_repos()
+        self.touch(3)
+        client.sync()
+        self.assertEqual(pool.stats()["127.0.0.1"]["requests"], 1 + 25 + 1)
+
+    def test_full_every(self):
+        """test that every n-th sync is a full one."""
+        snapshot = RepoSnapshot(full_every=3)
+        client = self.server.client("acme", snapshot=snapshot)
+        for _ in range(6):
+            client.sync()
+        self.assertEqual(snapshot.stats()["full_syncs"], 3)
+
+    def test_warm_start(self):
+        """test that a snapshot built from known repos syncs at once
+        incrementally."""
+        snapshot = RepoSnapshot(self.repos)
+        self.assertEqual(snapshot.cursor,
+                         max(repo["updated_at"] for repo in self.repos))
+        client = self.server.client("acme", snapshot=snapshot)
+        self.assertEqual(client.public_repos(), self.expected())
+        self.assertEqual(snapshot.stats()["full_syncs"], 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''Unittests for synthetic file'''
+import io
+import json
+from collections import Counter
+from unittest import TestCase, main
+
+from fixtures import TEST_PAYLOAD
+from stub_server import StubGithubServer
+from synthetic import SyntheticOrg
+
+
+class TestSyntheticOrg(TestCase):
+    """test the seeded repos generator."""
+
+    def test_deterministic(self):
+        """test that the same seed gives the same repos."""
+        org = SyntheticOrg("acme", 100, seed=7)
+        self.assertEqual(org[42], SyntheticOrg("acme", 100, seed=7)[42])
+        self.assertNotEqual(org[42], SyntheticOrg("acme", 100, seed=8)[42])
+        self.assertEqual(org[40:45], [org[i] for i in range(40, 45)])
+        self.assertEqual(org[-1], org[99])
+        with self.assertRaises(IndexError):
+            org[100]
+
+    def test_github_shape(self):
+        """test that repos carry every field of the fixture repos."""
+        repo = SyntheticOrg("acme", 1)[0]
+        self.assertLessEqual(set(TEST_PAYLOAD[0][1][0]), set(repo))
+        self.assertEqual(repo["owner"]["login"], "acme")
+        self.assertTrue(repo["url"].endswith("/repos/" + repo["full_name"]))
+        self.assertTrue(repo["owner"]["repos_url"].endswith("/users/acme/"
+                                                            "repos"))
+
+    def test_license_distribution(self):
+        """test that licenses follow the configured shares."""
+        org = SyntheticOrg("acme", 2000, licenses={"mit": 3, None: 1})
+        shares = Counter(org.license_at(i) for i in range(len(org)))
+        self.assertEqual(set(shares), {"mit", None})
+        self.assertAlmostEqual(shares["mit"] / len(org), 0.75, delta=0.05)
+        self.assertEqual(org[0]["license"] and org[0]["license"]["key"],
+                         org.license_at(0))
+
+    def test_field_sizes(self):
+        """test that descriptions and topics follow the settings."""
+        repo = SyntheticOrg("acme", 1, description_size=500, topics=3)[0]
+        self.assertEqual(len(repo["description"]), 500)
+        self.assertEqual(len(repo["topics"]), 3)
+
+    def test_write(self):
+        """test that the listing streams out as one JSON array."""
+        org = SyntheticOrg("acme", 25)
+        stream = io.BytesIO()
+        written = org.write(stream, batch=10)
+        self.assertEqual(written, len(stream.getvalue()))
+        self.assertEqual(json.loads(stream.getvalue()), org[:])
+
+    def test_served_by_stub(self):
+        """test that public_repos sees exactly the generated repos."""
+        org = SyntheticOrg("acme", 250, seed=3)
+        with StubGithubServer(page_size=100) as server:
+            server.add_org(org.login, org, org.org_payload)
+            client = server.client("acme")
+            self.assertEqual(client.public_repos(),
+                             list(org.expected_repos()))
+            self.assertEqual(client.public_repos("apache-2.0"),
+                             list(org.expected_repos("apache-2.0")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''Unittests for tracing file'''
+from unittest import TestCase, main
+
+from cache import ResponseCache
+from resilience import Resilience
+from stub_server import StubGithubServer
+from tracing import (RequestTrace, Tracer, current_trace, operation,
+                     percentile, request_trace)
+
+
+class TestTracer(TestCase):
+    """test request tracing against the local stub server."""
+
+    def setUp(self):
+        """serve the fixtures four repos per page."""
+        self.server = StubGithubServer(page_size=4).start()
+        self.addCleanup(self.server.stop)
+
+    def test_client_requests_are_traced(self):
+        """test that every request reports its operation and phases."""
+        seen = []
+        with Tracer(hooks=[seen.append]) as tracer:
+            self.server.client("google").public_repos("apache-2.0")
+        self.assertEqual([trace.operation for trace in seen],
+                         ["org", "repos_payload", "repos_payload",
+                          "repos_payload"])
+        for trace in seen:
+            self.assertEqual((trace.status, trace.attempts), (200, 1))
+            self.assertGreater(trace.bytes, 0)
+            self.assertIsNone(trace.cache)
+            for name in ("request", "download", "decode", "total"):
+                self.assertGreaterEqual(trace.phases[name], 0, name)
+            self.assertLessEqual(trace.phases["request"],
+                                 trace.phases["total"])
+        stats = tracer.stats()
+        self.assertEqual(stats["repos_payload"]["requests"], 3)
+        self.assertEqual(stats["repos_payload"]["status"], {200: 3})
+        self.assertLessEqual(stats["org"]["total_p50"],
+                             stats["org"]["total_p99"])
+
+    def test_cache_outcome(self):
+        """test that cache hits and misses are reported."""
+        with ResponseCache(), Tracer() as tracer:
+            self.server.client("google").org
+            self.server.client("google").org
+        self.assertEqual([trace.cache for trace in tracer.traces()],
+                         ["miss", "hit"])
+        self.assertEqual(tracer.traces()[1].status, 304)
+        self.assertEqual(tracer.stats()["org"]["cache"],
+                         {"miss": 1, "hit": 1})
+
+    def test_retries_are_attempts(self):
+        """test that retried requests count every attempt."""
+        server = StubGithubServer(error_rate=0.5, seed=1).start()
+        self.addCleanup(server.stop)
+        with Resilience(base_delay=0, max_attempts=20), Tracer() as tracer:
+            server.client("google").public_repos()
+        attempts = sum(trace.attempts for trace in tracer.traces())
+        self.assertEqual(attempts, server.stats()["requests"])
+        self.assertGreater(attempts, len(tracer.traces()))
+
+    def test_stream_mode(self):
+        """test that streamed pages are traced as they are consumed."""
+        with Tracer() as tracer:
+            repos = list(self.server.client("google", stream=True)
+                         .iter_public_repos())
+        self.assertEqual(len(repos), 9)
+        traces = [trace for trace in tracer.traces()
+                  if trace.operation == "iter_public_repos"]
+        self.assertEqual(len(traces), 3)
+        for trace in traces:
+            self.assertGreater(trace.bytes, 0)
+            self.assertGreaterEqual(trace.phases["decode"], 0)
+
+    def test_errors(self):
+        """test that a failing request is traced with its error."""
+        with Tracer() as tracer, operation("probe"):
+            with self.assertRaises(ValueError):
+                with request_trace("http://x") as trace:
+                    self.assertIs(current_trace(), trace)
+                    raise ValueError("boom")
+        self.assertIsNone(current_trace())
+        self.assertEqual(tracer.stats()["probe"]["errors"], 1)
+
+    def test_failing_hook_is_logged(self):
+        """test that a raising hook neither fails nor hides a request."""
+        seen = []
+
+        def broken(trace):
+            raise RuntimeError("exporter down")
+
+        with Tracer(hooks=[broken, seen.append]):
+            with self.assertLogs("tracing", "ERROR") as logs:
+                org = self.server.client("google").org
+        self.assertIn("repos_url", org)
+        self.assertEqual(len(seen), 1)
+        self.assertIn("exporter down", logs.output[0])
+
+    def test_disabled(self):
+        """test that nothing is traced without an active tracer."""
+        with request_trace("http://x") as trace:
+            self.assertIsNone(trace)
+            self.assertIsNone(current_trace())
+
+    def test_percentile(self):
+        """test the nearest-rank percentile."""
+        values = list(range(100))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertIsNone(percentile([], 0.5))
+        self.assertIn("'op'", repr(RequestTrace("u", "op")))
+
+
+if __name__ == "__main__":
+    main()
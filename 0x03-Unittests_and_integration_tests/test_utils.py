@@ -6,7 +6,13 @@ Create unittests for utils file
 from parameterized import parameterized
 from unittest import TestCase
 from unittest.mock import Mock, patch
-from utils import access_nested_map, get_json, memoize
+import json
+import threading
+from utils import (access_nested_map, compile_path, extract_path, get_json,
+                   iter_json_pages, iter_json_array, iter_json_items,
+                   memoize, timed_memoize, invalidate, async_memoize,
+                   MemoBudget, MEMO_BUDGET, MEMO_LOCK_STATS)
+import asyncio
 
 from typing import (
     Mapping,
@@ -45,6 +51,41 @@ class TestAccessNestedMap(TestCase):
             access_nested_map(nested_map, path)
 
 
+class TestCompilePath(TestCase):
+    """test that compiled accessors match access_nested_map."""
+
+    @parameterized.expand([
+        ({"a": 1}, ("a",), 1),
+        ({"a": {"b": 2}}, ("a",), {"b": 2}),
+        ({"a": {"b": 2}}, ("a", "b"), 2)]
+    )
+    def test_compile_path(self, nested_map: Mapping,
+                          path: Sequence, expected: int):
+        """test that the accessor returns what it is supposed to"""
+        self.assertEqual(compile_path(path)(nested_map), expected)
+
+    @parameterized.expand([
+        ({}, ("a",)),
+        ({"a": 1}, ("a", "b")),
+        ({"a": [1, 2]}, ("a", 0)),
+    ])
+    def test_compile_path_exception(self, nested_map: Mapping,
+                                    path: Sequence):
+        """test that a KeyError is raised like access_nested_map"""
+        with self.assertRaises(KeyError):
+            access_nested_map(nested_map, path)
+        with self.assertRaises(KeyError):
+            compile_path(path)(nested_map)
+
+    def test_extract_path(self):
+        """test that extract_path reads one path from every record"""
+        records = [{"a": {"b": 1}}, {"a": None}, {}, {"a": {"b": 4}}]
+        self.assertEqual(extract_path(records, ("a", "b"), None),
+                         [1, None, None, 4])
+        with self.assertRaises(KeyError):
+            extract_path(records, ("a", "b"))
+
+
 class TestGetJson(TestCase):
     """test that utils.get_json returns the expected result."""
 
@@ -62,6 +103,7 @@ class TestGetJson(TestCase):
 
         mock_response.return_value = test_payload
         mock_get_json.return_value.json.return_value = mock_response()
+        mock_get_json.return_value.content = json.dumps(test_payload).encode()
 
         data = get_json(test_url)
         mock_get_json.assert_called_once_with(test_url)
@@ -73,6 +115,7 @@ class TestGetJson(TestCase):
 
         mock_response.return_value = test_payload
         mock_get_json.return_value.json.return_value = mock_response()
+        mock_get_json.return_value.content = json.dumps(test_payload).encode()
 
         data = get_json(test_url)
         mock_get_json.assert_called_with(test_url)
@@ -80,6 +123,97 @@ class TestGetJson(TestCase):
         self.assertEqual(data, test_payload)
 
 
+class TestIterJsonPages(TestCase):
+    """test that utils.iter_json_pages follows Link rel=next."""
+
+    @staticmethod
+    def _pages(count: int):
+        """build `count` fake responses linked by rel=next."""
+        responses = []
+        for i in range(count):
+            response = Mock()
+            response.json.return_value = [i]
+            response.content = json.dumps([i]).encode()
+            response.links = {}
+            if i + 1 < count:
+                response.links = {"next": {"url": "u?page={}".format(i + 2)}}
+            responses.append(response)
+        return responses
+
+    @parameterized.expand([(False,), (True,)])
+    @patch('requests.get')
+    def test_iter_json_pages(self, prefetch: bool, mock_get: Callable):
+        """test that every page is yielded in order."""
+        mock_get.side_effect = self._pages(3)
+        pages = list(iter_json_pages("u", prefetch=prefetch))
+        self.assertEqual(pages, [[0], [1], [2]])
+        self.assertEqual([c[0][0] for c in mock_get.call_args_list],
+                         ["u", "u?page=2", "u?page=3"])
+
+    @patch('requests.get')
+    def test_iter_json_pages_is_lazy(self, mock_get: Callable):
+        """test that pages are only fetched when needed."""
+        mock_get.side_effect = self._pages(3)
+        pages = iter_json_pages("u")
+        self.assertEqual(next(pages), [0])
+        mock_get.assert_called_once_with("u")
+
+
+class TestIterJsonArray(TestCase):
+    """test the incremental JSON array decoder."""
+
+    @parameterized.expand([(1,), (3,), (64,)])
+    def test_chunk_boundaries(self, size: int):
+        """test that elements split across chunks are decoded."""
+        data = [{"name": "repo{}".format(i), "license": {"key": "é"}}
+                for i in range(20)] + [12, "x", None, [1, [2]]]
+        raw = json.dumps(data, ensure_ascii=False).encode()
+        chunks = (raw[i:i + size] for i in range(0, len(raw), size))
+        self.assertEqual(list(iter_json_array(chunks)), data)
+
+    @parameterized.expand([
+        ([b'[{"score": 1.', b'5}, 2.', b'5]'], [{"score": 1.5}, 2.5]),
+        ([b'[1e', b'3]'], [1e3]),
+        ([b'[12', b'34]'], [1234]),
+        ([b'[1', b'.5', b'e-', b'2, -', b'7]'], [0.015, -7]),
+        ([b'[-0.2', b'5E+', b'1]'], [-2.5]),
+    ])
+    def test_numbers_split_across_chunks(self, chunks: list, data: list):
+        """test that a number cut by a chunk boundary is read whole."""
+        self.assertEqual(list(iter_json_array(chunks)), data)
+
+    def test_is_incremental(self):
+        """test that elements are yielded before the input ends."""
+        def chunks():
+            yield b'[{"a": 1}, '
+            raise AssertionError("read past the first element")
+
+        self.assertEqual(next(iter_json_array(chunks())), {"a": 1})
+
+    @parameterized.expand([
+        (b'{}',), (b'[1 2]',), (b'[1,',), (b'[1,]',), (b'',)
+    ])
+    def test_invalid(self, raw: bytes):
+        """test that malformed input raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(iter_json_array([raw]))
+
+    @patch('requests.get')
+    def test_iter_json_items(self, mock_get: Callable):
+        """test that items are streamed across every page."""
+        first, second = Mock(), Mock()
+        first.links = {"next": {"url": "u?page=2"}}
+        first.iter_content.return_value = [b'[1, ', b'2]']
+        second.links = {}
+        second.iter_content.return_value = [b'[3]']
+        mock_get.side_effect = [first, second]
+
+        self.assertEqual(list(iter_json_items("u")), [1, 2, 3])
+        mock_get.assert_called_with("u?page=2", stream=True)
+        first.close.assert_called_once()
+        second.close.assert_called_once()
+
+
 class TestMemoize(TestCase):
     """test that utils.memoize returns the expected results."""
 
@@ -103,3 +237,177 @@ class TestMemoize(TestCase):
             # no () because memoize returns a property
 
             mock_a_method.assert_called_once()
+
+
+class TestTimedMemoize(TestCase):
+    """test that utils.timed_memoize expires, revalidates and evicts."""
+
+    class Counter:
+        """count how many times the memoized value is computed."""
+
+        def __init__(self, ttl=None):
+            self.calls = 0
+            self.ttl = ttl
+            self.gate = threading.Event()
+            self.gate.set()
+
+        @timed_memoize(ttl=10)
+        def fixed(self):
+            self.calls += 1
+            return self.calls
+
+        @timed_memoize(ttl="ttl", stale_while_revalidate=True)
+        def stale(self):
+            self.gate.wait(5)
+            self.calls += 1
+            return self.calls
+
+        @timed_memoize()
+        def big(self):
+            self.calls += 1
+            return ["x" * 1000] * 10
+
+    @patch('utils.time.monotonic')
+    def test_ttl_expiry(self, mock_clock):
+        """test that the value is recomputed once the ttl elapsed."""
+        mock_clock.return_value = 100
+        inst = self.Counter()
+        self.assertEqual((inst.fixed, inst.fixed), (1, 1))
+        mock_clock.return_value = 111
+        self.assertEqual(inst.fixed, 2)
+
+    def test_invalidate(self):
+        """test that invalidate forces a recomputation."""
+        inst = self.Counter()
+        self.assertEqual(inst.fixed, 1)
+        invalidate(inst, "fixed")
+        self.assertEqual(inst.fixed, 2)
+        invalidate(inst)
+        self.assertEqual(inst.fixed, 3)
+
+    @patch('utils.time.monotonic')
+    def test_stale_while_revalidate(self, mock_clock):
+        """test that the stale value is served during the refresh."""
+        mock_clock.return_value = 100
+        inst = self.Counter(ttl=5)
+        self.assertEqual(inst.stale, 1)
+        mock_clock.return_value = 106
+        inst.gate.clear()
+        self.assertEqual(inst.stale, 1)
+        self.assertEqual(inst.stale, 1)
+        inst.gate.set()
+        for _ in range(500):
+            if inst.__dict__["_stale"].value == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(inst.stale, 2)
+        self.assertEqual(inst.calls, 2)
+
+    def test_memory_budget(self):
+        """test that the least recently used values are evicted."""
+        self.addCleanup(MEMO_BUDGET.resize, MEMO_BUDGET.max_bytes)
+        first, second = self.Counter(), self.Counter()
+        first.big
+        MEMO_BUDGET.resize(MEMO_BUDGET.stats()["bytes"] + 1000)
+        second.big
+        self.assertNotIn("_big", first.__dict__)
+        self.assertIn("_big", second.__dict__)
+        first.big
+        self.assertEqual(first.calls, 2)
+
+    def test_memory_budget_recency(self):
+        """test that hits keep a value and skip the lock if unbounded."""
+        budget = MemoBudget()
+        first, second = self.Counter(), self.Counter()
+        with patch("utils.MEMO_BUDGET", budget):
+            first.big
+            second.big
+            with patch.object(budget, "_lock") as mock_lock:
+                first.big
+                mock_lock.__enter__.assert_not_called()
+            budget.resize(budget.stats()["bytes"])
+            first.big
+            budget.resize(budget.stats()["bytes"] - 1)
+        self.assertIn("_big", first.__dict__)
+        self.assertNotIn("_big", second.__dict__)
+        self.assertEqual(budget.stats()["evictions"], 1)
+
+
+class TestSingleFlightMemoize(TestCase):
+    """test that concurrent callers compute a memoized value once."""
+
+    def setUp(self):
+        """start every test with fresh contention metrics."""
+        MEMO_LOCK_STATS.reset()
+
+    def test_threads(self):
+        """test that racing threads share one computation."""
+        started = threading.Event()
+        release = threading.Event()
+
+        class TestClass:
+            calls = 0
+
+            @timed_memoize(single_flight=True)
+            def a_property(self):
+                TestClass.calls += 1
+                started.set()
+                release.wait(5)
+                return 42
+
+        inst = TestClass()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            inst.a_property)) for _ in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(TestClass.calls, 1)
+        stats = MEMO_LOCK_STATS.stats()
+        self.assertEqual(stats["computations"], 1)
+        self.assertGreaterEqual(stats["contended"], 1)
+
+    def test_coroutines(self):
+        """test that concurrent coroutines await a single task."""
+        class TestClass:
+            calls = 0
+
+            @async_memoize
+            async def a_method(self):
+                TestClass.calls += 1
+                await asyncio.sleep(0.01)
+                return 42
+
+        inst = TestClass()
+
+        async def run():
+            return await asyncio.gather(*(inst.a_method()
+                                          for _ in range(5)))
+
+        self.assertEqual(asyncio.run(run()), [42] * 5)
+        self.assertEqual(asyncio.run(inst.a_method()), 42)
+        self.assertEqual(TestClass.calls, 1)
+        self.assertEqual(MEMO_LOCK_STATS.stats()["contended"], 4)
+
+    def test_coroutine_failure_is_retried(self):
+        """test that a failed computation is not memoized."""
+        class TestClass:
+            calls = 0
+
+            @async_memoize
+            async def a_method(self):
+                TestClass.calls += 1
+                if TestClass.calls == 1:
+                    raise ValueError("first call fails")
+                return 42
+
+        inst = TestClass()
+        with self.assertRaises(ValueError):
+            asyncio.run(inst.a_method())
+        self.assertEqual(asyncio.run(inst.a_method()), 42)
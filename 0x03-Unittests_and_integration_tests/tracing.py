@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Request-level tracing for get_json and the github org client.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+__all__ = [
+    "PHASES",
+    "RequestTrace",
+    "Tracer",
+    "activate",
+    "current_operation",
+    "current_trace",
+    "current_tracer",
+    "operation",
+    "operation_iter",
+    "percentile",
+    "phase",
+    "request_trace",
+]
+
+_logger = logging.getLogger(__name__)
+
+PHASES = ("wait", "request", "download", "decode", "total")
+"""Timed phases of a request, in seconds.
+`wait` is time held back by the rate-limit scheduler; `request` runs
+from sending the request to parsing the response headers and so covers
+DNS, connect, TLS and server time, which requests does not expose
+separately; `download` reads the body and `decode` parses it. `total`
+also counts retries and their backoff.
+"""
+
+_current_tracer = contextvars.ContextVar("current_tracer", default=None)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_operation = contextvars.ContextVar("current_operation",
+                                            default=None)
+
+
+def current_tracer() -> Optional["Tracer"]:
+    """Return the tracer active in the current context, if any.
+    """
+    return _current_tracer.get()
+
+
+def current_trace() -> Optional["RequestTrace"]:
+    """Return the trace of the request being made, if it is traced.
+    """
+    return _current_trace.get()
+
+
+def current_operation() -> Optional[str]:
+    """Return the client method the current requests are made for.
+    """
+    return _current_operation.get()
+
+
+@contextmanager
+def operation(name: str) -> Iterator[None]:
+    """Attribute the requests made in the block to operation `name`.
+    """
+    token = _current_operation.set(name)
+    try:
+        yield
+    finally:
+        _current_operation.reset(token)
+
+
+def operation_iter(name: str, iterable: Iterable) -> Iterator:
+    """Iterate, attributing the requests made by each step to `name`.
+    Unlike wrapping a generator body in `operation`, the caller's own
+    code between items is left unattributed.
+    """
+    iterator = iter(iterable)
+    while True:
+        with operation(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the time spent in the block to phase `name` of the current
+    trace; a no-op when the request is not traced.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def activate(trace: Optional["RequestTrace"]) -> Iterator[None]:
+    """Make trace the current one in the block; None leaves it as is.
+    """
+    if trace is None:
+        yield
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def request_trace(url: str) -> Iterator[Optional["RequestTrace"]]:
+    """Trace the request to `url` made in the block with the active
+    tracer; yields None when there is none.
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    trace = tracer.start(url)
+    error = None
+    try:
+        with activate(trace):
+            yield trace
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        tracer.finish(trace, error)
+
+
+def percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    """The `fraction` percentile of sorted values, None when empty.
+    """
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+class RequestTrace:
+    """What happened to one logical request.
+    `attempts` counts the GETs actually sent, retries included; `cache`
+    is "hit" or "miss" when a response cache was consulted; `bytes` is
+    the size of the received bodies, as announced by Content-Length for
+    streamed ones.
+    """
+    __slots__ = ("url", "operation", "status", "bytes", "cache",
+                 "attempts", "phases", "error", "started", "_clock")
+
+    def __init__(self, url: str, operation: str = None) -> None:
+        """Init method of RequestTrace"""
+        self.url = url
+        self.operation = operation
+        self.status = None
+        self.bytes = 0
+        self.cache = None
+        self.attempts = 0
+        self.phases = {}
+        self.error = None
+        self.started = time.time()
+        self._clock = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add seconds to phase `name`.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_response(self, response: Any, seconds: float,
+                        stream: bool = False) -> None:
+        """Account for one response received in `seconds`.
+        """
+        self.attempts += 1
+        self.status = response.status_code
+        elapsed = getattr(response, "elapsed", None)
+        if isinstance(elapsed, timedelta):
+            request = min(elapsed.total_seconds(), seconds)
+        else:
+            request = seconds
+        self.add("request", request)
+        if stream:
+            length = response.headers.get("Content-Length")
+            self.bytes += int(length) if length else 0
+        else:
+            self.add("download", seconds - request)
+            content = response.content
+            self.bytes += len(content) if isinstance(content, bytes) else 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The trace as plain data"""
+        return {"url": self.url, "operation": self.operation,
+                "status": self.status, "bytes": self.bytes,
+                "cache": self.cache, "attempts": self.attempts,
+                "phases": dict(self.phases),
+                "error": None if self.error is None else repr(self.error),
+                "started": self.started}
+
+    def __repr__(self) -> str:
+        """Repr of RequestTrace"""
+        return "RequestTrace({!r}, {!r}, status={!r}, total={:.4f})".format(
+            self.url, self.operation, self.status,
+            self.phases.get("total", 0.0))
+
+
+class Tracer:
+    """Collect a `RequestTrace` for every get_json request.
+    Each finished trace is passed to every hook and kept, up to the
+    last `keep` of them, for `stats` to aggregate. Requests are
+    attributed to the client method they were made for (`org`,
+    `repos_payload`, ...) through `operation`.
+    Example
+    -------
+    >>> with Tracer(hooks=[print]) as tracer:
+    ...     GithubOrgClient("google").public_repos()
+    RequestTrace('https://api.github.com/orgs/google', 'org', ...)
+    RequestTrace('https://api.github.com/orgs/google/repos', ...)
+    >>> tracer.stats()["repos_payload"]["total_p50"]
+    0.21
+    """
+
+    def __init__(self, hooks: Iterable[Callable[[RequestTrace], None]] = (),
+                 keep: int = 10000) -> None:
+        """Init method of Tracer"""
+        self._hooks = list(hooks)
+        self._traces = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self) -> "Tracer":
+        """Make the tracer the active one"""
+        self._token = _current_tracer.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Deactivate the tracer"""
+        if self._token is not None:
+            _current_tracer.reset(self._token)
+            self._token = None
+
+    def add_hook(self, hook: Callable[[RequestTrace], None]) -> None:
+        """Call hook with every trace finished from now on.
+        """
+        self._hooks.append(hook)
+
+    def start(self, url: str) -> RequestTrace:
+        """Begin the trace of a request to url.
+        """
+        return RequestTrace(url, _current_operation.get())
+
+    def finish(self, trace: RequestTrace,
+               error: BaseException = None) -> None:
+        """Complete a trace and hand it to the hooks.
+        A hook raising is logged and skipped, so a broken exporter never
+        fails or hides the request it traces.
+        """
+        trace.phases["total"] = time.perf_counter() - trace._clock
+        trace.error = error
+        with self._lock:
+            self._traces.append(trace)
+        for hook in self._hooks:
+            try:
+                hook(trace)
+            except Exception:
+                _logger.exception("tracing hook %r failed on %r",
+                                  hook, trace)
+
+    def traces(self) -> List[RequestTrace]:
+        """The kept traces, oldest first.
+        """
+        with self._lock:
+            return list(self._traces)
+
+    def stats(self) -> Dict[Optional[str], Dict[str, Any]]:
+        """Aggregates of the kept traces per operation.
+        Each operation reports `requests`, `errors`, `attempts`,
+        `bytes`, counts per `status` and `cache` outcome, and p50, p90
+        and p99 seconds of every phase, e.g. `decode_p90`.
+        """
+        groups = {}
+        for trace in self.traces():
+            groups.setdefault(trace.operation, []).append(trace)
+        stats = {}
+        for name, traces in groups.items():
+            group = {
+                "requests": len(traces),
+                "errors": sum(trace.error is not None for trace in traces),
+                "attempts": sum(trace.attempts for trace in traces),
+                "bytes": sum(trace.bytes for trace in traces),
+                "status": {},
+                "cache": {},
+            }
+            for trace in traces:
+                group["status"][trace.status] = \
+                    group["status"].get(trace.status, 0) + 1
+                if trace.cache is not None:
+                    group["cache"][trace.cache] = \
+                        group["cache"].get(trace.cache, 0) + 1
+            for phase_name in PHASES:
+                values = sorted(trace.phases.get(phase_name, 0.0)
+                                for trace in traces)
+                for label, fraction in (("p50", 0.5), ("p90", 0.9),
+                                        ("p99", 0.99)):
+                    group["{}_{}".format(phase_name, label)] = percentile(
+                        values, fraction)
+            stats[name] = group
+        return stats
+
+    def reset(self) -> None:
+        """Forget the kept traces.
+        """
+        with self._lock:
+            self._traces.clear()
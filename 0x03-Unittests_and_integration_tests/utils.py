@@ -1,7 +1,19 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import asyncio
+import codecs
+import contextvars
+import json
+import itertools
+import re
 import requests
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
 from typing import (
     Mapping,
@@ -9,12 +21,41 @@ from typing import (
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
 
+from cache import current_cache
+from json_backends import decode_response
+from pool import SessionPool, current_pool, use_pool
+from ratelimit import RateLimitExceeded, current_scheduler, rate_limited
+from resilience import current_resilience
+from tracing import (activate, current_trace, current_tracer, phase,
+                     request_trace)
+
 __all__ = [
     "access_nested_map",
+    "compile_path",
+    "extract_path",
     "get_json",
+    "get_json_page",
+    "iter_json_pages",
+    "iter_json_items",
+    "iter_json_array",
     "memoize",
+    "timed_memoize",
+    "invalidate",
+    "memo_version",
+    "async_memoize",
+    "LockStats",
+    "MEMO_LOCK_STATS",
+    "MemoBudget",
+    "MEMO_BUDGET",
+    "deep_sizeof",
 ]
 
 
@@ -40,11 +81,319 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
+_MISSING = object()
+
+# what may still follow a number cut at the end of a chunk
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+
+def compile_path(path: Sequence) -> Callable[[Mapping], Any]:
+    """Compile a key path into a reusable accessor.
+    The accessor behaves like `access_nested_map` with the path fixed,
+    but skips the `Mapping` ABC check for plain dicts, which is what
+    decoded JSON is made of.
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"))
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    """
+    keys = tuple(path)
+
+    def accessor(nested_map: Mapping) -> Any:
+        """access the compiled path in nested_map"""
+        for key in keys:
+            if type(nested_map) is not dict and \
+                    not isinstance(nested_map, Mapping):
+                raise KeyError(key)
+            nested_map = nested_map[key]
+        return nested_map
+
+    accessor.path = keys
+    return accessor
+
+
+def extract_path(records: Iterable[Mapping], path: Sequence,
+                 default: Any = _MISSING) -> List[Any]:
+    """Access the same key path in every record in a single call.
+    `path` may also be an accessor returned by `compile_path`. Records
+    missing the path give `default`, or raise KeyError when no default
+    is given.
+    Example
+    -------
+    >>> extract_path([{"a": {"b": 1}}, {"a": None}], ("a", "b"), None)
+    [1, None]
+    """
+    accessor = path if callable(path) else compile_path(path)
+    if default is _MISSING:
+        return [accessor(record) for record in records]
+    values = []
+    append = values.append
+    for record in records:
+        try:
+            append(accessor(record))
+        except KeyError:
+            append(default)
+    return values
+
+
 def get_json(url: str) -> Dict:
     """Get JSON from remote URL.
+    The request goes through the active `pool.SessionPool` when there
+    is one, so consecutive calls reuse keep-alive connections. With an
+    active `cache.ResponseCache` the request is conditional and an
+    unchanged document is served from the cache. The body is decoded
+    by the current `json_backends` backend. With an active
+    `tracing.Tracer` the request is traced.
+    """
+    with request_trace(url):
+        cache = current_cache()
+        if cache is not None:
+            return cache.fetch(url, _get)
+        response = _get(url)
+        with phase("decode"):
+            return decode_response(response)
+
+
+def get_json_page(url: str) -> Tuple[Any, Optional[str]]:
+    """Get one page of a paginated JSON listing.
+    Returns the decoded page and the URL of the next page taken from
+    the `Link: rel="next"` header, or None on the last page.
+    """
+    with request_trace(url):
+        cache = current_cache()
+        if cache is not None:
+            return cache.fetch_page(url, _get)
+        response = _get(url)
+        with phase("decode"):
+            data = decode_response(response)
+        return data, response.links.get("next", {}).get("url")
+
+
+def iter_json_pages(url: str, prefetch: bool = False,
+                    pool: SessionPool = None) -> Iterator[Any]:
+    """Lazily yield every page of a paginated JSON listing.
+    With `prefetch`, the next page is downloaded in a background thread
+    while the caller consumes the current one, so at most two pages are
+    held in memory. Requests go through `pool` when given.
+    Example
+    -------
+    >>> for page in iter_json_pages("https://api.github.com/orgs/x/repos"):
+    ...     print(len(page))
+    30
+    12
+    """
+    def fetch(page_url: str) -> Tuple[Any, Optional[str]]:
+        """fetch one page through the requested pool"""
+        with use_pool(pool):
+            return get_json_page(page_url)
+
+    if not prefetch:
+        while url:
+            page, url = fetch(url)
+            yield page
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(contextvars.copy_context().run, fetch, url)
+        while future is not None:
+            page, url = future.result()
+            future = None
+            if url:
+                future = executor.submit(contextvars.copy_context().run,
+                                         fetch, url)
+            yield page
+    finally:
+        executor.shutdown(wait=False)
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Incrementally decode a top-level JSON array from byte chunks.
+    Each element is yielded as soon as it is complete, so only one
+    element and the undecoded tail of the input are held in memory.
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"a": 1}, {"a"', b': 2}]']))
+    [{'a': 1}, {'a': 2}]
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    exhausted = False
+    state = "start"
+
+    def more() -> bool:
+        """append the next chunk to the buffer, False at the end"""
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buffer):
+            if more():
+                continue
+            raise ValueError("unexpected end of JSON array")
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise ValueError("expected a JSON array")
+            pos += 1
+            state = "first"
+        elif state == "separator":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("expected ',' or ']', got {!r}".format(char))
+            pos += 1
+            state = "value"
+        elif state == "first" and char == "]":
+            return
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            if (end == len(buffer) or (
+                    type(item) in (int, float) and
+                    _NUMBER_TAIL.match(buffer, end))) and more():
+                continue
+            pos = end
+            state = "separator"
+            yield item
+
+
+def iter_json_items(url: str, pool: SessionPool = None,
+                    chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """Stream the elements of a paginated JSON array listing.
+    Every page is requested with a streamed body and decoded element by
+    element with `iter_json_array`, so neither a whole body nor a whole
+    page is ever held in memory. Streamed responses bypass the response
+    cache. Requests go through `pool` when given. A traced page is
+    finished once its last element has been consumed.
     """
-    response = requests.get(url)
-    return response.json()
+    while url:
+        tracer = current_tracer()
+        trace = tracer.start(url) if tracer is not None else None
+        error = None
+        try:
+            with use_pool(pool), activate(trace):
+                response = _get(url, stream=True)
+            try:
+                url = response.links.get("next", {}).get("url")
+                chunks = response.iter_content(chunk_size=chunk_size)
+                items = iter_json_array(_timed(chunks, trace, "download"))
+                for item in _timed(items, trace, "decode"):
+                    yield item
+            finally:
+                response.close()
+        except GeneratorExit:
+            raise
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            if trace is not None:
+                trace.add("decode", -trace.phases.get("download", 0.0))
+                tracer.finish(trace, error)
+
+
+def _timed(iterator: Iterable, trace: Any, name: str) -> Iterator:
+    """Add the time spent producing each item to phase name of trace"""
+    if trace is None:
+        return iter(iterator)
+
+    def timed() -> Iterator:
+        """time every next() of iterator"""
+        items = iter(iterator)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                trace.add(name, time.perf_counter() - start)
+            yield item
+
+    return timed()
+
+
+def _get(url: str, headers: Dict = None,
+         stream: bool = False) -> requests.Response:
+    """Send a GET request through the active pool, if any.
+    The active `ratelimit.RateLimitScheduler` paces the request and
+    learns from its rate-limit headers; the active
+    `resilience.Resilience` retries it on transient failures.
+    """
+    kwargs = {"headers": headers} if headers else {}
+    if stream:
+        kwargs["stream"] = True
+    resilience = current_resilience()
+    if resilience is None:
+        return _send(url, kwargs)
+    return resilience.call(url, lambda: _send(url, kwargs))
+
+
+def _send(url: str, kwargs: Dict) -> requests.Response:
+    """Send one GET request, paced by the active scheduler.
+    A rate-limited answer is resent once the scheduler's pause is over,
+    until the scheduler's wait budget would be exceeded.
+    """
+    trace = current_trace()
+    scheduler = current_scheduler()
+    waited = 0.0
+    while True:
+        if scheduler is not None:
+            delay = scheduler.acquire()
+            waited += delay
+            if trace is not None:
+                trace.add("wait", delay)
+        pool = current_pool()
+        start = time.perf_counter()
+        if pool is None:
+            response = requests.get(url, **kwargs)
+        else:
+            response = pool.get(url, **kwargs)
+        if trace is not None:
+            trace.record_response(response, time.perf_counter() - start,
+                                  stream=kwargs.get("stream", False))
+        if scheduler is None:
+            return response
+        limited = response.status_code in (403, 429) and rate_limited(
+            response.status_code, response.headers, _body(response))
+        pause = scheduler.update(response.headers, response.status_code,
+                                 limited)
+        if not limited:
+            return response
+        if waited + pause > scheduler.max_wait:
+            raise RateLimitExceeded(
+                "{} is rate limited for {:.0f}s more".format(url, pause),
+                response=response, retry_after=pause)
+        response.close()
+
+
+def _body(response: requests.Response) -> str:
+    """The text of a response, "" when it has none to give"""
+    try:
+        text = response.text
+    except Exception:
+        return ""
+    return text if isinstance(text, str) else ""
 
 
 def memoize(fn: Callable) -> Callable:
@@ -73,3 +422,393 @@ def memoize(fn: Callable) -> Callable:
         return getattr(self, attr_name)
 
     return property(memoized)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate memory footprint of a JSON-like object tree.
+    Objects using `__slots__` are followed through their slots.
+    Example
+    -------
+    >>> deep_sizeof({"a": [1, 2]}) > deep_sizeof({})
+    True
+    """
+    size = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(type(item), "__slots__"):
+            stack.extend(getattr(item, slot) for slot in type(item).__slots__
+                         if hasattr(item, slot))
+    return size
+
+
+class MemoBudget:
+    """Process-wide memory budget shared by every `timed_memoize` value.
+    Values are tracked least recently used first; when the tracked total
+    goes over `max_bytes` the oldest values are dropped from their
+    instances and recomputed on next access. None means unbounded.
+    Sizing a large payload costs more than fetching it, so while the
+    budget is unbounded values are only measured when `stats` asks.
+    Hits only stamp the value with a tick, without the lock, and values
+    are ordered by their ticks when something has to be evicted.
+    """
+
+    def __init__(self, max_bytes: int = None) -> None:
+        """Init method of MemoBudget"""
+        self.max_bytes = max_bytes
+        self._entries = {}
+        self._used = {}
+        self._ticks = itertools.count()
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    def track(self, obj: Any, attr_name: str, value: Any) -> None:
+        """Account for a freshly memoized value and enforce the budget.
+        """
+        key = (id(obj), attr_name)
+        ref = weakref.ref(obj, lambda _: self.discard_key(key))
+        size = deep_sizeof(value) if self.max_bytes is not None else None
+        with self._lock:
+            self.discard_key(key)
+            self._entries[key] = (ref, size)
+            self._used[key] = next(self._ticks)
+            self._bytes += size or 0
+            self._shrink()
+
+    def touch(self, obj: Any, attr_name: str) -> None:
+        """Mark a memoized value as recently used; nothing to do while
+        the budget is unbounded.
+        """
+        if self.max_bytes is None:
+            return
+        key = (id(obj), attr_name)
+        if key in self._used:
+            self._used[key] = next(self._ticks)
+
+    def discard(self, obj: Any, attr_name: str) -> None:
+        """Stop accounting for a memoized value.
+        """
+        self.discard_key((id(obj), attr_name))
+
+    def discard_key(self, key: Tuple[int, str]) -> None:
+        """Stop accounting for the value stored under key"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._used.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1] or 0
+
+    def resize(self, max_bytes: Optional[int]) -> None:
+        """Change the budget, evicting values if it shrank.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            if max_bytes is not None:
+                self._measure()
+            self._shrink()
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """Tracked `entries` and `bytes`, `max_bytes` and `evictions`.
+        """
+        with self._lock:
+            self._measure()
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes,
+                    "evictions": self._evictions}
+
+    def _measure(self) -> None:
+        """Size the values tracked while the budget was unbounded"""
+        for key, (ref, size) in list(self._entries.items()):
+            obj = ref()
+            if size is not None or obj is None:
+                continue
+            entry = obj.__dict__.get(key[1])
+            size = deep_sizeof(getattr(entry, "value", entry))
+            self._entries[key] = (ref, size)
+            self._bytes += size
+
+    def _shrink(self) -> None:
+        """Evict least recently used values until under budget"""
+        if self.max_bytes is None or self._bytes <= self.max_bytes:
+            return
+        used = self._used
+        for key in sorted(self._entries, key=lambda key: used.get(key, -1)):
+            if self._bytes <= self.max_bytes:
+                break
+            ref, size = self._entries.pop(key)
+            used.pop(key, None)
+            self._bytes -= size or 0
+            self._evictions += 1
+            obj = ref()
+            if obj is not None:
+                obj.__dict__.pop(key[1], None)
+
+
+MEMO_BUDGET = MemoBudget()
+
+
+class LockStats:
+    """Contention metrics of the single-flight memoize locks.
+    """
+
+    def __init__(self) -> None:
+        """Init method of LockStats"""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter.
+        """
+        with self._lock:
+            self._acquisitions = 0
+            self._contended = 0
+            self._wait_seconds = 0.0
+            self._max_wait_seconds = 0.0
+            self._computations = 0
+
+    def record(self, waited: Optional[float]) -> None:
+        """Count one acquisition; `waited` is None when uncontended.
+        """
+        with self._lock:
+            self._acquisitions += 1
+            if waited is not None:
+                self._contended += 1
+                self._wait_seconds += waited
+                self._max_wait_seconds = max(self._max_wait_seconds,
+                                             waited)
+
+    def computed(self) -> None:
+        """Count one computation of a memoized value.
+        """
+        with self._lock:
+            self._computations += 1
+
+    @contextmanager
+    def hold(self, lock: threading.Lock) -> Iterator[None]:
+        """Acquire lock for the block, recording any contention.
+        """
+        waited = None
+        if not lock.acquire(blocking=False):
+            start = time.perf_counter()
+            lock.acquire()
+            waited = time.perf_counter() - start
+        self.record(waited)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def stats(self) -> Dict[str, float]:
+        """`acquisitions`, `contended` ones, total and max wait seconds
+        and the number of `computations` actually run.
+        """
+        with self._lock:
+            return {"acquisitions": self._acquisitions,
+                    "contended": self._contended,
+                    "wait_seconds": self._wait_seconds,
+                    "max_wait_seconds": self._max_wait_seconds,
+                    "computations": self._computations}
+
+
+MEMO_LOCK_STATS = LockStats()
+
+_memo_locks_guard = threading.Lock()
+
+
+def _memo_lock(obj: Any, attr_name: str) -> threading.Lock:
+    """Return the lock guarding one memoized attribute of obj"""
+    locks = obj.__dict__.get("_memo_locks")
+    if locks is None or attr_name not in locks:
+        with _memo_locks_guard:
+            locks = obj.__dict__.setdefault("_memo_locks", {})
+            return locks.setdefault(attr_name, threading.Lock())
+    return locks[attr_name]
+
+
+_memo_versions = itertools.count(1)
+
+
+class _MemoEntry:
+    """A memoized value with its expiry time"""
+    __slots__ = ("value", "expires", "refreshing", "version")
+
+    def __init__(self, value: Any, expires: Optional[float]) -> None:
+        """Init method of _MemoEntry"""
+        self.value = value
+        self.expires = expires
+        self.refreshing = False
+        self.version = next(_memo_versions)
+
+
+def timed_memoize(ttl: Union[float, str] = None,
+                  stale_while_revalidate: bool = False,
+                  single_flight: bool = False
+                  ) -> Callable[[Callable], property]:
+    """Decorator factory to memoize a method for a limited time.
+    Like `memoize` the method becomes a property. The value expires
+    `ttl` seconds after it was computed; `ttl` may also name an instance
+    attribute holding the lifetime, and None never expires. With
+    `stale_while_revalidate`, an expired value keeps being served while
+    a background thread recomputes it. Values count against
+    `MEMO_BUDGET` and can be dropped early with `invalidate`.
+    With `single_flight`, concurrent threads missing the value wait on a
+    per-instance, per-attribute lock for the one computing it instead
+    of computing it again; see `MEMO_LOCK_STATS` for contention.
+    Example
+    -------
+    class MyClass:
+        @timed_memoize(ttl=60)
+        def a_method(self):
+            print("a_method called")
+            return 42
+    >>> my_object = MyClass()
+    >>> my_object.a_method
+    a_method called
+    42
+    >>> invalidate(my_object, "a_method")
+    >>> my_object.a_method
+    a_method called
+    42
+    """
+    def decorator(fn: Callable) -> property:
+        """wrap fn into a timed memoized property"""
+        attr_name = "_{}".format(fn.__name__)
+
+        def refresh(self) -> Any:
+            """compute, store and account for a fresh value"""
+            value = fn(self)
+            lifetime = getattr(self, ttl) if isinstance(ttl, str) else ttl
+            expires = None
+            if lifetime is not None:
+                expires = time.monotonic() + lifetime
+            self.__dict__[attr_name] = _MemoEntry(value, expires)
+            MEMO_BUDGET.track(self, attr_name, value)
+            return value
+
+        def fresh(entry: Any) -> bool:
+            """whether entry holds a value that has not expired"""
+            return isinstance(entry, _MemoEntry) and (
+                entry.expires is None or time.monotonic() < entry.expires)
+
+        def compute(self) -> Any:
+            """refresh, once per instance at a time in single_flight"""
+            if not single_flight:
+                return refresh(self)
+            with MEMO_LOCK_STATS.hold(_memo_lock(self, attr_name)):
+                entry = self.__dict__.get(attr_name)
+                if fresh(entry):
+                    return entry.value
+                MEMO_LOCK_STATS.computed()
+                return refresh(self)
+
+        def revalidate(self, entry: _MemoEntry) -> None:
+            """refresh in the background, keeping the stale value"""
+            try:
+                compute(self)
+            finally:
+                entry.refreshing = False
+
+        @wraps(fn)
+        def memoized(self):
+            """"memoized wraps"""
+            entry = self.__dict__.get(attr_name)
+            if fresh(entry):
+                MEMO_BUDGET.touch(self, attr_name)
+                return entry.value
+            if not isinstance(entry, _MemoEntry) or \
+                    not stale_while_revalidate:
+                return compute(self)
+            with _memo_locks_guard:
+                start = not entry.refreshing
+                entry.refreshing = True
+            if start:
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(revalidate, self, entry), daemon=True).start()
+            return entry.value
+
+        return property(memoized)
+
+    return decorator
+
+
+def invalidate(obj: Any, name: str = None) -> None:
+    """Drop the `timed_memoize` value `name` of obj, or all of them.
+    """
+    names = [name] if name is not None else [
+        attr[1:] for attr, value in list(obj.__dict__.items())
+        if isinstance(value, _MemoEntry)]
+    for each in names:
+        attr_name = "_{}".format(each)
+        if isinstance(obj.__dict__.get(attr_name), _MemoEntry):
+            del obj.__dict__[attr_name]
+        MEMO_BUDGET.discard(obj, attr_name)
+
+
+def memo_version(obj: Any, name: str) -> Optional[int]:
+    """Version of the `timed_memoize` value `name` currently held by obj.
+    Every recomputation gets a new version, so values derived from a
+    memoized one can tell when to rebuild. None when nothing is held.
+    """
+    entry = obj.__dict__.get("_{}".format(name))
+    return entry.version if isinstance(entry, _MemoEntry) else None
+
+
+def async_memoize(fn: Callable) -> Callable:
+    """Decorator to memoize a coroutine method, single-flight.
+    The first caller starts the computation and every concurrent caller
+    awaits that same task, so exactly one is in flight per instance and
+    attribute. A failed computation is forgotten and retried by the
+    next caller. Unlike `memoize` the method stays a coroutine method.
+    Example
+    -------
+    class MyClass:
+        @async_memoize
+        async def a_method(self):
+            print("a_method called")
+            return 42
+    >>> my_object = MyClass()
+    >>> asyncio.run(asyncio.gather(my_object.a_method(),
+    ...                            my_object.a_method()))
+    a_method called
+    [42, 42]
+    """
+    attr_name = "_{}".format(fn.__name__)
+
+    def forget_failure(obj: Any, task: asyncio.Future) -> None:
+        """drop a task that did not produce a value"""
+        if task.cancelled() or task.exception() is not None:
+            if obj.__dict__.get(attr_name) is task:
+                del obj.__dict__[attr_name]
+
+    @wraps(fn)
+    async def memoized(self):
+        """"memoized wraps"""
+        task = self.__dict__.get(attr_name)
+        if task is not None and task.done():
+            return task.result()
+        if task is None:
+            MEMO_LOCK_STATS.record(None)
+            MEMO_LOCK_STATS.computed()
+            task = asyncio.ensure_future(fn(self))
+            self.__dict__[attr_name] = task
+            task.add_done_callback(lambda done: forget_failure(self, done))
+            return await asyncio.shield(task)
+        start = time.perf_counter()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            MEMO_LOCK_STATS.record(time.perf_counter() - start)
+
+    return memoized